@@ -1,13 +1,10 @@
 import streamlit as st
-from utils import load_data, aplicar_estilos
+import instrumentacao
+from utils import load_data, aplicar_estilos, carregamento, memoria_execucao
 
-# Carregar estilos e dados
+# Carregar estilos; dados e modelo são carregados em segundo plano (ver utils.carregamento), e a
+# navegação é exibida sem esperar por eles
 aplicar_estilos()
-if 'df' not in st.session_state:
-    df = load_data()
-    st.session_state['df'] = df
-else:
-    df = st.session_state['df']
 
 
 def pagina_inicial():
@@ -25,6 +22,9 @@ def pagina_inicial():
     st.divider()
 
     # --- 2. MÉTRICAS PRINCIPAIS (KPIs) ---
+    # Visão do dataset compartilhado pelo processo, sem cópia por sessão
+    with st.spinner("Carregando os dados..."):
+        df = load_data()
     total_participantes = df.shape[0]
     paises_cobertos = df['country'].nunique()
     media_idade = int(df['age'].median())
@@ -93,7 +93,29 @@ pages = [
 with st.sidebar:
     st.write("Bem vindo ao projeto de análise de dados sobre saúde mental no setor de tecnologia!")
     st.write("Selecione uma página no menu para começar a explorar os dados.")
-
-# Executa a navegação
+    estado = carregamento()
+    if estado.erro is not None:
+        # O carregamento com falha é descartado: o próximo rerun tenta de novo
+        carregamento.clear()
+        st.error(f"Não foi possível carregar os dados: {estado.erro}")
+    elif not estado.concluido:
+        # Fragmento atualizado sozinho enquanto o carregamento em segundo plano não termina
+        @st.fragment(run_every=0.5)
+        def progresso_carregamento():
+            if carregamento().erro is not None:
+                # Rerun completo: encerra a atualização periódica e mostra o erro
+                st.rerun()
+            if carregamento().concluido:
+                return
+            fracao, etapa = carregamento().progresso()
+            st.progress(fracao, text=f"{etapa}...")
+
+        progresso_carregamento()
+
+# Executa a navegação, medindo as etapas de cada execução (painel com ?debug=1 na URL)
 pg = st.navigation(pages)
-pg.run()
\ No newline at end of file
+instrumentacao.iniciar_execucao(pg.title)
+pg.run()
+resumo = instrumentacao.finalizar_execucao(memoria_execucao())
+if instrumentacao.painel_ativo():
+    instrumentacao.painel(resumo)
@@ -0,0 +1,212 @@
+"""
+Agregações pré-calculadas usadas pelas páginas.
+
+O cubo de contagens guarda o número de respondentes por combinação das dimensões de filtro e de
+gráfico da Análise Geral. Os filtros da barra lateral somam fatias do cubo, cujo tamanho depende do
+número de combinações distintas, e não do número de respondentes. A idade entra no cubo em faixas de
+um ano, o que permite calcular os quartis do box plot exatamente a partir das contagens.
+"""
+
+import numpy as np
+import pandas as pd
+
+import genero
+import traducao
+from utils import cache_incremental, cache_por_versao
+
+IDADE_MIN, IDADE_MAX = 15, 80
+DIMENSOES_CUBO = ['country', 'gender_group_classified', 'family_history', 'treatment', 'benefits', 'idade']
+
+
+def _somar_cubos(anterior, novo):
+    # Uma categoria nova (ex.: um país) muda as categorias das dimensões: o cubo é recalculado
+    if not all(novo[coluna].cat.categories.equals(anterior[coluna].cat.categories)
+               for coluna in DIMENSOES_CUBO if coluna != 'idade'):
+        return None
+    return (pd.concat([anterior, novo], ignore_index=True)
+            .groupby(DIMENSOES_CUBO, observed=True, dropna=False)['n'].sum().reset_index())
+
+
+@cache_incremental(_somar_cubos)
+def construir_cubo(df):
+    """
+    Contagem de respondentes por combinação das dimensões; idades fora de 15-80 ficam como NaN.
+    Com respostas anexadas ao dataset, só as linhas novas são contadas e somadas ao cubo anterior.
+    """
+    idade = df['age'].astype('float64')
+    chaves = pd.DataFrame({
+        'country': df['country'],
+        'gender_group_classified': coluna_derivada(df, 'gender_group_classified'),
+        'family_history': df['family_history'],
+        'treatment': df['treatment'],
+        'benefits': df['benefits'],
+        'idade': idade.where((idade >= IDADE_MIN) & (idade <= IDADE_MAX)),
+    })
+    return (chaves.groupby(DIMENSOES_CUBO, observed=True, dropna=False)
+            .size().rename('n').reset_index())
+
+
+# Cada lote anexado cria uma versão: só as duas mais recentes ficam em memória
+@cache_por_versao(recurso=True, max_entries=2)
+def cubo_analise_geral(df):
+    """
+    Cubo da Análise Geral com os rótulos em português, calculado uma vez por versão do dataset e
+    compartilhado sem cópia (os filtros só leem o cubo; ver fatiar).
+    """
+    return traducao.traduzir(construir_cubo(df))
+
+
+def fatiar(cubo, **filtros):
+    """Linhas do cubo cujas dimensões estão nos valores pedidos (ex.: country=['Brazil'])."""
+    mascara = np.ones(len(cubo), dtype=bool)
+    for coluna, valores in filtros.items():
+        mascara &= cubo[coluna].isin(valores).to_numpy()
+    return cubo[mascara]
+
+
+def contagens(fatia, coluna):
+    """Equivalente a value_counts() sobre os respondentes da fatia."""
+    return (fatia.groupby(coluna, observed=True)['n'].sum()
+            .sort_values(ascending=False, kind='stable'))
+
+
+def _quantil(valores, acumulado, n, p):
+    # Interpolação linear (mesmo método padrão do numpy e do Plotly) sobre a amostra expandida
+    h = (n - 1) * p
+    abaixo, acima = int(np.floor(h)), int(np.ceil(h))
+    v_abaixo = valores[np.searchsorted(acumulado, abaixo, side='right')]
+    v_acima = valores[np.searchsorted(acumulado, acima, side='right')]
+    return v_abaixo + (h - abaixo) * (v_acima - v_abaixo)
+
+
+def resumo_box(valores, pesos):
+    """Quartis, cercas (1,5 x IQR) e outliers de uma amostra dada por valores distintos e contagens."""
+    ordem = np.argsort(valores)
+    valores, pesos = np.asarray(valores, dtype=float)[ordem], np.asarray(pesos)[ordem]
+    acumulado = np.cumsum(pesos)
+    n = int(acumulado[-1])
+    q1, mediana, q3 = (_quantil(valores, acumulado, n, p) for p in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    dentro = (valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)
+    return {
+        'n': n, 'q1': q1, 'mediana': mediana, 'q3': q3,
+        'cerca_inferior': valores[dentro].min(), 'cerca_superior': valores[dentro].max(),
+        'outliers': valores[~dentro],
+    }
+
+
+def resumos_box(fatia, grupo, valor='idade'):
+    """Resumo do box plot de `valor` para cada categoria de `grupo`, a partir das contagens do cubo."""
+    histograma = (fatia.dropna(subset=[valor])
+                  .groupby([grupo, valor], observed=True)['n'].sum())
+    resumos = []
+    for rotulo, contagem in histograma.groupby(level=0, observed=True):
+        resumos.append({grupo: rotulo, **resumo_box(contagem.index.get_level_values(1), contagem.to_numpy())})
+    return pd.DataFrame(resumos)
+
+
+# --- Tabelas de contingência ---
+
+FAIXAS_ETARIAS = [15, 24, 34, 44, 54, 64, 80]
+ROTULOS_FAIXAS = ['15-24', '25-34', '35-44', '45-54', '55-64', '65-80']
+
+# Colunas derivadas aceitas pelo motor de contingência, calculadas só quando pedidas
+DERIVADAS = {
+    'faixa_etaria': lambda df: pd.cut(df['age'], bins=FAIXAS_ETARIAS, labels=ROTULOS_FAIXAS),
+    'gender_group_classified': lambda df: genero.classificar(df['gender'], 'classificado'),
+}
+
+
+# Uma entrada por coluna derivada e versão (as duas mais recentes)
+@cache_por_versao(recurso=True, max_entries=2 * len(DERIVADAS))
+def coluna_derivada(df, nome):
+    """Coluna derivada calculada uma vez por versão do dataset e compartilhada, sem cópia, entre as sessões."""
+    return DERIVADAS[nome](df)
+
+
+def _categorica(df, nome):
+    serie = coluna_derivada(df, nome) if nome in DERIVADAS else df[nome]
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    return serie
+
+
+def _somar_contagens(anterior, novo):
+    if not (anterior[1].equals(novo[1]) and anterior[2].equals(novo[2])):
+        return None
+    return anterior[0] + novo[0], anterior[1], anterior[2]
+
+
+@cache_incremental(_somar_contagens, max_entries=256)
+def contar(df, linha, coluna, filtro=None):
+    """
+    Matriz de contagens linha x coluna calculada com um único np.bincount sobre os códigos categóricos.
+    `filtro` é uma sequência de pares (coluna, valores) aplicada antes da contagem.
+    Devolve a matriz e as categorias de cada eixo; valores ausentes não são contados.
+    Com respostas anexadas ao dataset, só as linhas novas são contadas e somadas às contagens anteriores.
+    """
+    a, b = _categorica(df, linha), _categorica(df, coluna)
+    codigos_a = a.cat.codes.to_numpy().astype(np.int64)
+    codigos_b = b.cat.codes.to_numpy().astype(np.int64)
+
+    validos = (codigos_a >= 0) & (codigos_b >= 0)
+    for coluna_filtro, valores in filtro or ():
+        validos &= _categorica(df, coluna_filtro).isin(valores).to_numpy()
+
+    ka, kb = len(a.cat.categories), len(b.cat.categories)
+    contagens = np.bincount(codigos_a[validos] * kb + codigos_b[validos], minlength=ka * kb).reshape(ka, kb)
+    return contagens, a.cat.categories, b.cat.categories
+
+
+@cache_por_versao(max_entries=128)
+def tabela_contingencia(df, linha, coluna, normalizar=None, filtro=None, idioma='pt', n_boot=None, seed=42):
+    """
+    Contagens e proporções de `linha` x `coluna` em formato longo: colunas [linha, coluna, 'contagem',
+    'proporcao']. `normalizar` define a base da proporção: None (total), 'linha' ou 'coluna'.
+    Com `n_boot`, acrescenta o intervalo de confiança bootstrap de 95% de cada proporção
+    ('ic_inferior', 'ic_superior'). Categorias sem nenhuma resposta são descartadas, como em
+    pd.crosstab. Memoizada por versão do dataset e argumentos: trocar de aba vira uma consulta ao cache.
+    """
+    contagens, cats_linha, cats_coluna = contar(df, linha, coluna, filtro)
+    usadas_linha, usadas_coluna = contagens.sum(axis=1) > 0, contagens.sum(axis=0) > 0
+    contagens = contagens[usadas_linha][:, usadas_coluna]
+    cats_linha, cats_coluna = cats_linha[usadas_linha], cats_coluna[usadas_coluna]
+
+    if normalizar == 'linha':
+        base = contagens.sum(axis=1, keepdims=True)
+    elif normalizar == 'coluna':
+        base = contagens.sum(axis=0, keepdims=True)
+    else:
+        base = contagens.sum()
+
+    ka, kb = contagens.shape
+    tabela = pd.DataFrame({
+        linha: pd.Categorical.from_codes(np.repeat(np.arange(ka), kb), categories=cats_linha),
+        coluna: pd.Categorical.from_codes(np.tile(np.arange(kb), ka), categories=cats_coluna),
+        'contagem': contagens.ravel(),
+        'proporcao': (contagens / np.maximum(base, 1)).ravel(),
+    })
+    if n_boot:
+        tabela['ic_inferior'], tabela['ic_superior'] = _intervalos_bootstrap(contagens, normalizar, n_boot, seed)
+    return traducao.traduzir(tabela, idioma)
+
+
+def _intervalos_bootstrap(contagens, normalizar, n_boot, seed):
+    # Importado aqui: o scipy (via estatisticas) só é carregado quando os intervalos são pedidos
+    from estatisticas import bootstrap_proporcoes
+
+    # Cada base de normalização (linha, coluna ou a tabela inteira) é um grupo multinomial
+    if normalizar == 'linha':
+        inferior, superior = bootstrap_proporcoes(contagens, n_boot, seed)
+    elif normalizar == 'coluna':
+        inferior, superior = (m.T for m in bootstrap_proporcoes(contagens.T, n_boot, seed))
+    else:
+        inferior, superior = (m.reshape(contagens.shape)
+                              for m in bootstrap_proporcoes(contagens.reshape(1, -1), n_boot, seed))
+    return inferior.ravel(), superior.ravel()
+
+
+def pivotar(tabela, valor='contagem'):
+    """Tabela de contingência longa de volta ao formato largo (linhas x colunas)."""
+    linha, coluna = tabela.columns[:2]
+    return tabela.pivot(index=linha, columns=coluna, values=valor)
@@ -0,0 +1,243 @@
+"""
+Benchmarks dos caminhos críticos do app, sem Streamlit (servidor) e sem rede.
+
+A partir de uma cópia local do survey.csv são geradas bases maiores (por padrão 10 mil, 100 mil e
+1 milhão de respondentes, gerados por sintetico.py com semente fixa) e, para cada tamanho, são
+medidos: o carregamento (CSV -> snapshot e snapshot mapeado), as agregações das
+páginas (cubo da Análise Geral, tabelas da Comparações com bootstrap, qui-quadrado e matriz de
+associação), o treino do modelo, o clustering (K-Means exato e em mini-lotes) e a previsão
+(predict_proba em lote e o preditor rápido, perfil a perfil). Os caches do Streamlit ficam de fora:
+as funções recebem o dataset sem versão, o que desativa cache_por_versao.
+
+Cada etapa roda uma vez com tracemalloc, para o pico de memória alocada, e depois `repeticoes`
+vezes sem ele; fica o menor tempo. O resultado vai para um JSON que pode ser comparado com uma base:
+
+    python -m benchmark survey.csv --saida resultados.json
+    python -m benchmark survey.csv --tamanhos 10000 --comparar resultados.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import agregacoes
+import estatisticas
+import modelo
+import perfis
+import utils
+from preditor import PreditorRapido
+from sintetico import GeradorSintetico
+
+logger = logging.getLogger(__name__)
+
+TAMANHOS = [10_000, 100_000, 1_000_000]
+REPETICOES = 3
+# Aumento de tempo, em relação à base, a partir do qual uma etapa é apontada como regressão
+TOLERANCIA = 0.2
+PERFIS_PREDITOR = 1000
+
+# Chamadas de tabela_contingencia feitas pela página de Comparações (N_BOOT = 2000 na página)
+TABELAS_COMPARACOES = [
+    ('family_history', 'treatment', {}),
+    ('remote_work', 'treatment', {}),
+    ('faixa_etaria', 'treatment', {}),
+    ('gender_group', 'treatment', {}),
+    *[('gender_group', coluna, {'normalizar': 'linha', 'n_boot': 2000})
+      for coluna in ('treatment', 'seek_help', 'supervisor', 'mental_health_consequence')],
+    *[('gender_group_classified', coluna, {'normalizar': 'linha', 'idioma': 'en', 'n_boot': 2000})
+      for coluna in ('benefits', 'care_options', 'seek_help', 'anonymity')],
+]
+COLUNAS_CORRELACOES = ('treatment', 'benefits', 'care_options', 'seek_help', 'anonymity', 'family_history', 'remote_work')
+
+
+def gerar_base(original, linhas, destino, seed=42):
+    """CSV com `linhas` respondentes sintéticos com as distribuições do CSV `original`."""
+    return GeradorSintetico(pd.read_csv(original)).gravar(destino, linhas, seed)
+
+
+def sem_cache(df):
+    """Visão do dataset sem versão: as funções com cache_por_versao calculam tudo de novo."""
+    visao = df.copy(deep=False)
+    visao.attrs = {}
+    return visao
+
+
+def _pico_mb(funcao):
+    # Execução isolada com tracemalloc
+    tracemalloc.start()
+    try:
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    return pico
+
+
+def medir(etapa, linhas, funcao, repeticoes=REPETICOES, itens=None, preparar=None):
+    """
+    Mede uma etapa: pico de memória (MB) em uma execução com tracemalloc e o menor tempo (s) e a
+    mediana entre `repeticoes` execuções sem ele. `preparar` roda antes de cada execução, fora da
+    medida. `itens` é o número de elementos processados, para a vazão.
+    """
+    if preparar:
+        preparar()
+    pico = _pico_mb(funcao)
+
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    itens = itens or linhas
+    resultado = {
+        'etapa': etapa, 'linhas': linhas, 'segundos': min(tempos), 'mediana_s': statistics.median(tempos),
+        'pico_memoria_mb': pico, 'itens_por_segundo': itens / min(tempos),
+    }
+    logger.info("%-22s %9d linhas %10.3f s %10.1f MB", etapa, linhas, resultado['segundos'], pico)
+    return resultado
+
+
+def _comparacoes(df):
+    for linha, coluna, opcoes in TABELAS_COMPARACOES:
+        agregacoes.tabela_contingencia(df, linha, coluna, **opcoes)
+    estatisticas.associacoes_qui_quadrado(df)
+
+
+def _analise_geral(df):
+    cubo = agregacoes.cubo_analise_geral(df)
+    for coluna in ('gender_group_classified', 'family_history', 'treatment', 'benefits'):
+        agregacoes.contagens(cubo, coluna)
+    agregacoes.resumos_box(cubo, 'treatment')
+
+
+def _previsao_perfis(preditor, perfis_formulario):
+    for perfil in perfis_formulario:
+        preditor.probabilidade(perfil)
+
+
+def executar(csv, linhas, repeticoes=REPETICOES, etapas=None):
+    """Resultados de todas as etapas (ou só das `etapas` indicadas) para a base `csv`."""
+    quer = (lambda etapa: etapas is None or etapa in etapas)
+    caminho, caminho_meta = utils.caminhos_snapshot(str(csv))
+
+    def apagar_snapshot():
+        caminho.unlink(missing_ok=True)
+        caminho_meta.unlink(missing_ok=True)
+
+    resultados = []
+    if quer('carregar_csv'):
+        resultados.append(medir('carregar_csv', linhas, lambda: utils.carregar_dataset(str(csv)),
+                                repeticoes, preparar=apagar_snapshot))
+    df = utils.carregar_dataset(str(csv))
+    if quer('carregar_snapshot'):
+        resultados.append(medir('carregar_snapshot', linhas, lambda: utils.carregar_dataset(str(csv)), repeticoes))
+    dados = sem_cache(df)
+
+    if quer('analise_geral'):
+        resultados.append(medir('analise_geral', linhas, lambda: _analise_geral(dados), repeticoes))
+    if quer('comparacoes'):
+        resultados.append(medir('comparacoes', linhas, lambda: _comparacoes(dados), repeticoes))
+    if quer('correlacoes'):
+        resultados.append(medir('correlacoes', linhas, lambda: estatisticas.matriz_associacao(
+            dados, COLUNAS_CORRELACOES, 'cramer_v'), repeticoes))
+
+    X, y = modelo.preparar_dados(dados)
+    if quer('treino'):
+        resultados.append(medir('treino', linhas, lambda: modelo.treinar(X, y), repeticoes))
+    if quer('previsao_lote') or quer('previsao_perfil'):
+        pipeline, _ = modelo.treinar(X, y)
+        if quer('previsao_lote'):
+            resultados.append(medir('previsao_lote', linhas, lambda: pipeline.predict_proba(X), repeticoes))
+        if quer('previsao_perfil'):
+            preditor = PreditorRapido(pipeline)
+            perfis_formulario = X.iloc[:PERFIS_PREDITOR].to_dict('records')
+            resultados.append(medir('previsao_perfil', linhas, lambda: _previsao_perfis(preditor, perfis_formulario),
+                                    repeticoes, itens=len(perfis_formulario)))
+
+    if quer('clustering_exato'):
+        resultados.append(medir('clustering_exato', linhas, lambda: perfis.solucoes_kmeans(dados), repeticoes))
+    if quer('clustering_mini_lote'):
+        fonte = caminho if caminho.exists() else dados
+        resultados.append(medir('clustering_mini_lote', linhas, lambda: perfis.ajustar_mini_lote(fonte), repeticoes))
+    return resultados
+
+
+def ambiente():
+    """Versões e máquina em que os benchmarks rodaram, gravadas com os resultados."""
+    return {
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'sklearn': sklearn.__version__, 'plataforma': platform.platform(), 'cpus': os.cpu_count(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def comparar(atual, base, tolerancia=TOLERANCIA):
+    """Tabela atual x base por (etapa, linhas), com a razão de tempo e de memória e as regressões."""
+    colunas = ['etapa', 'linhas', 'segundos', 'pico_memoria_mb']
+    tabela = pd.merge(pd.DataFrame(atual['resultados'])[colunas], pd.DataFrame(base['resultados'])[colunas],
+                      on=['etapa', 'linhas'], suffixes=('', '_base'))
+    tabela['razao_tempo'] = tabela['segundos'] / tabela['segundos_base']
+    tabela['razao_memoria'] = tabela['pico_memoria_mb'] / tabela['pico_memoria_mb_base']
+    tabela['regressao'] = tabela['razao_tempo'] > 1 + tolerancia
+    return tabela
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                     description="Benchmarks dos caminhos críticos do app com bases de vários tamanhos.")
+    parser.add_argument('origem', help="cópia local do survey.csv")
+    parser.add_argument('--tamanhos', type=int, nargs='*', default=TAMANHOS,
+                        help="linhas das bases geradas, além da original")
+    parser.add_argument('--etapas', nargs='+', default=None, help="só estas etapas (padrão: todas)")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--saida', help="grava os resultados neste JSON")
+    parser.add_argument('--comparar', help="resultados base (JSON) para comparação")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if utils.eh_url(args.origem):
+        parser.error("a origem deve ser um arquivo local (os benchmarks não usam a rede)")
+
+    diretorio = Path(tempfile.mkdtemp(prefix='benchmark-'))
+    # Snapshots das bases geradas ficam no diretório temporário, fora do cache do app
+    utils.DIRETORIO_CACHE = diretorio / 'cache'
+    try:
+        bases = [(Path(args.origem), len(pd.read_csv(args.origem)))]
+        bases += [(gerar_base(args.origem, n, diretorio / f"survey-{n}.csv"), n) for n in args.tamanhos]
+        resultados = []
+        for csv, linhas in bases:
+            resultados.extend(executar(csv, linhas, args.repeticoes, args.etapas))
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    atual = {'ambiente': ambiente(), 'repeticoes': args.repeticoes, 'resultados': resultados}
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(atual, indent=2))
+    if not args.comparar:
+        return 0
+
+    tabela = comparar(atual, json.loads(Path(args.comparar).read_text()), args.tolerancia)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(tabela.round(3).to_string(index=False))
+    return 1 if tabela['regressao'].any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
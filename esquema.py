@@ -0,0 +1,116 @@
+"""
+Esquema de tipos do dataset da pesquisa.
+
+Cada coluna de resposta vira uma categórica com o conjunto de categorias conhecido (ordenada quando a
+resposta é uma escala), a idade vira um inteiro compacto e as colunas de texto livre (país, estado)
+viram categóricas inferidas. Agrupamentos, crosstabs e filtros passam a trabalhar sobre os códigos
+inteiros das categorias em vez de arrays de objetos Python. A economia de memória por coluna fica
+registrada no snapshot e pode ser consultada com:
+
+    python -m esquema
+"""
+
+import argparse
+import logging
+import sys
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SIM_NAO = ['No', 'Yes']
+SIM_NAO_NAO_SEI = ['No', 'Yes', "Don't know"]
+SIM_NAO_TALVEZ = ['No', 'Maybe', 'Yes']
+
+# Idades fora deste intervalo são erros de digitação (ex.: -1726, 99999999999) e viram NA
+IDADE_MINIMA, IDADE_MAXIMA = 0, 120
+
+ESQUEMA = {
+    'self_employed': pd.CategoricalDtype(SIM_NAO),
+    'family_history': pd.CategoricalDtype(SIM_NAO),
+    'treatment': pd.CategoricalDtype(SIM_NAO),
+    'work_interfere': pd.CategoricalDtype(['Never', 'Rarely', 'Sometimes', 'Often'], ordered=True),
+    'no_employees': pd.CategoricalDtype(['1-5', '6-25', '26-100', '100-500', '500-1000', 'More than 1000'],
+                                        ordered=True),
+    'remote_work': pd.CategoricalDtype(SIM_NAO),
+    'tech_company': pd.CategoricalDtype(SIM_NAO),
+    'benefits': pd.CategoricalDtype(SIM_NAO_NAO_SEI),
+    'care_options': pd.CategoricalDtype(['No', 'Yes', 'Not sure']),
+    'wellness_program': pd.CategoricalDtype(SIM_NAO_NAO_SEI),
+    'seek_help': pd.CategoricalDtype(SIM_NAO_NAO_SEI),
+    'anonymity': pd.CategoricalDtype(SIM_NAO_NAO_SEI),
+    'leave': pd.CategoricalDtype(['Very easy', 'Somewhat easy', "Don't know", 'Somewhat difficult',
+                                  'Very difficult'], ordered=True),
+    'mental_health_consequence': pd.CategoricalDtype(SIM_NAO_TALVEZ),
+    'phys_health_consequence': pd.CategoricalDtype(SIM_NAO_TALVEZ),
+    'coworkers': pd.CategoricalDtype(['No', 'Some of them', 'Yes']),
+    'supervisor': pd.CategoricalDtype(['No', 'Some of them', 'Yes']),
+    'mental_health_interview': pd.CategoricalDtype(SIM_NAO_TALVEZ),
+    'phys_health_interview': pd.CategoricalDtype(SIM_NAO_TALVEZ),
+    'mental_vs_physical': pd.CategoricalDtype(SIM_NAO_NAO_SEI),
+    'obs_consequence': pd.CategoricalDtype(SIM_NAO),
+    # Texto livre com poucas categorias distintas: categorias inferidas dos dados
+    'country': 'category',
+    'state': 'category',
+}
+
+
+def _converter_idade(idade):
+    idade = pd.to_numeric(idade, errors='coerce')
+    idade = idade.where(idade.between(IDADE_MINIMA, IDADE_MAXIMA))
+    return idade.astype('Int16')
+
+
+def aplicar_esquema(df):
+    """Converte as colunas do DataFrame (já com nomes normalizados) para os tipos declarados em ESQUEMA."""
+    for coluna, tipo in ESQUEMA.items():
+        if coluna not in df.columns:
+            continue
+        antes = df[coluna].notna().sum()
+        df[coluna] = df[coluna].astype(tipo)
+        perdidos = antes - df[coluna].notna().sum()
+        if perdidos:
+            logger.warning("%d valores de '%s' fora das categorias conhecidas viraram NaN", perdidos, coluna)
+
+    if 'age' in df.columns:
+        df['age'] = _converter_idade(df['age'])
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    return df
+
+
+def relatorio_memoria(antes, depois):
+    """Memória por coluna (bytes) antes e depois da aplicação do esquema."""
+    # Colunas derivadas (ex.: gender_group) não existem no CSV bruto e ficam sem valor "antes"
+    relatorio = pd.DataFrame({'antes': antes, 'depois': depois}).astype('Int64')
+    relatorio = relatorio.drop(index='Index', errors='ignore')
+    relatorio['reducao'] = 1 - relatorio['depois'] / relatorio['antes']
+    return relatorio.rename_axis('coluna')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m esquema',
+                                     description="Memória de cada coluna antes e depois do esquema de tipos.")
+    parser.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    args = parser.parse_args(argv)
+
+    # Importado só aqui: utils depende deste módulo
+    import utils
+    # Garante o snapshot (e o relatório gravado com ele) da origem atual
+    utils.carregar_dataset(args.origem)
+    relatorio = utils.memoria_esquema(args.origem)
+    if relatorio.empty:
+        print("Sem snapshot gravado: o relatório de memória não está disponível")
+        return 1
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(relatorio.sort_values('antes', ascending=False).round({'reducao': 3}).to_string())
+    # Só as colunas que existem no CSV bruto entram na comparação
+    comparaveis = relatorio.dropna(subset=['antes'])
+    antes, depois = comparaveis['antes'].sum() / 2 ** 20, comparaveis['depois'].sum() / 2 ** 20
+    print(f"\nColunas do CSV: {antes:.2f} MB antes do esquema, {depois:.2f} MB depois "
+          f"({1 - depois / antes:.0%} a menos)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
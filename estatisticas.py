@@ -0,0 +1,222 @@
+"""
+Testes estatísticos em lote sobre as colunas categóricas da pesquisa.
+
+Todas as tabelas de contingência entre pares de colunas saem de uma única matriz de Gram G = XᵀX,
+onde X é a matriz indicadora (one-hot) esparsa de todas as colunas: o bloco (i, j) de G é a tabela
+cruzada da coluna i com a coluna j. O qui-quadrado, os graus de liberdade e o V de Cramér de todos os
+pares são calculados de uma vez com operações matriciais sobre G, sem uma chamada ao scipy por par.
+Valores ausentes são ignorados par a par (cada par usa as linhas em que as duas colunas foram respondidas).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+import esquema
+from utils import cache_incremental, cache_por_versao
+
+# Colunas categóricas da pesquisa usadas nas análises de associação
+COLUNAS_CATEGORICAS = [c for c in esquema.ESQUEMA if c != 'state'] + ['gender_group']
+
+
+def matriz_indicadora(df, colunas):
+    """
+    Matriz one-hot esparsa (linhas x categorias de todas as colunas) montada direto dos códigos
+    categóricos, junto com a coluna de origem de cada categoria e os rótulos das categorias.
+    """
+    linhas, indices, grupo, rotulos = [], [], [], []
+    deslocamento = 0
+    for j, coluna in enumerate(colunas):
+        serie = df[coluna] if isinstance(df[coluna].dtype, pd.CategoricalDtype) else df[coluna].astype('category')
+        codigos = serie.cat.codes.to_numpy()
+        respondidas = np.flatnonzero(codigos >= 0)
+        linhas.append(respondidas)
+        indices.append(codigos[respondidas].astype(np.int64) + deslocamento)
+        k = len(serie.cat.categories)
+        grupo.append(np.full(k, j))
+        rotulos.extend((coluna, c) for c in serie.cat.categories)
+        deslocamento += k
+
+    linhas, indices = np.concatenate(linhas), np.concatenate(indices)
+    X = sparse.csr_matrix((np.ones(len(linhas), dtype=np.float64), (linhas, indices)),
+                          shape=(len(df), deslocamento))
+    return X, np.concatenate(grupo), rotulos
+
+
+def _somar_cruzamentos(anterior, novo):
+    if anterior['rotulos'] != novo['rotulos']:
+        return None
+    return {**anterior, 'gram': anterior['gram'] + novo['gram']}
+
+
+@cache_incremental(_somar_cruzamentos, max_entries=32)
+def cruzamentos(df, colunas=None):
+    """
+    Matriz de Gram com as tabelas cruzadas de todos os pares de colunas (ver docstring do módulo).
+    G é aditiva nas linhas: com respostas anexadas, só as linhas novas entram no cálculo.
+    """
+    colunas = list(colunas or COLUNAS_CATEGORICAS)
+    X, grupo, rotulos = matriz_indicadora(df, colunas)
+    return {'gram': (X.T @ X).toarray(), 'grupo': grupo, 'rotulos': rotulos, 'colunas': colunas}
+
+
+def _marginais(cruz):
+    G, grupo = cruz['gram'], cruz['grupo']
+    S = np.zeros((len(grupo), len(cruz['colunas'])))
+    S[np.arange(len(grupo)), grupo] = 1
+    # R[a, j]: respondentes da categoria a que também responderam a coluna j
+    R = G @ S
+    # N[i, j]: respondentes que responderam as colunas i e j
+    N = S.T @ R
+    return S, R, N
+
+
+def qui_quadrado_pares(cruz):
+    """
+    Qui-quadrado (sem correção de Yates), graus de liberdade, p-valor, V de Cramér e n de todos os
+    pares de colunas, como matrizes p x p. A diagonal fica como NaN.
+    """
+    G, grupo = cruz['gram'], cruz['grupo']
+    S, R, N = _marginais(cruz)
+
+    # Esperado de cada célula (a, b) dentro do seu par de colunas
+    total_linha = R[:, grupo]
+    total_coluna = total_linha.T
+    n_par = N[grupo][:, grupo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        esperado = total_linha * total_coluna / n_par
+        contribuicao = np.where(esperado > 0, (G - esperado) ** 2 / esperado, 0.0)
+    chi2 = S.T @ contribuicao @ S
+
+    # Categorias efetivamente observadas em cada par
+    observadas = S.T @ (R > 0)
+    gl = (observadas - 1) * (observadas.T - 1)
+    menor_dim = np.minimum(observadas, observadas.T) - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(gl > 0, stats.chi2.sf(chi2, np.maximum(gl, 1)), np.nan)
+        cramer_v = np.sqrt(chi2 / (N * menor_dim))
+    cramer_v = np.where(menor_dim > 0, cramer_v, np.nan)
+
+    diagonal = np.eye(len(N), dtype=bool)
+    for matriz in (chi2, p, cramer_v):
+        matriz[diagonal] = np.nan
+    return {'chi2': chi2, 'gl': gl, 'p': p, 'cramer_v': cramer_v, 'n': N}
+
+
+def theil_u_pares(cruz):
+    """
+    Coeficiente de incerteza de Theil entre todos os pares, como matriz p x p: a posição (i, j) é
+    U(i | j), a fração da entropia da coluna i explicada por conhecer a coluna j. Não é simétrico.
+    """
+    G, grupo = cruz['gram'], cruz['grupo']
+    S, R, N = _marginais(cruz)
+    n_par = N[grupo][:, grupo]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # H(i | j) = -soma p(a, b) log(p(a, b) / p(b)), com p(b) a marginal de b dentro do par
+        p_conjunta = G / n_par
+        p_b = R[:, grupo].T / n_par
+        termo_condicional = np.where(G > 0, p_conjunta * np.log(p_conjunta / p_b), 0.0)
+        # H(i) = -soma p(a) log p(a), com p(a) calculada sobre as linhas em que j também foi respondida
+        p_a = R / N[grupo]
+        termo_marginal = np.where(R > 0, p_a * np.log(p_a), 0.0)
+        h_condicional = -(S.T @ termo_condicional @ S)
+        h_marginal = -(S.T @ termo_marginal)
+        u = np.where(h_marginal > 0, (h_marginal - h_condicional) / h_marginal, np.nan)
+
+    np.fill_diagonal(u, 1.0)
+    return u
+
+
+METRICAS_ASSOCIACAO = {
+    'cramer_v': "V de Cramér",
+    'theil_u': "U de Theil",
+}
+
+
+@cache_por_versao(max_entries=32)
+def matriz_associacao(df, colunas, metrica='cramer_v'):
+    """
+    Matriz de associação entre as colunas escolhidas usando todas as categorias de cada uma:
+    'cramer_v' (simétrica) ou 'theil_u' (linha = variável explicada, coluna = variável conhecida).
+    Calculada a partir da matriz de Gram e memoizada por versão do dataset e conjunto de colunas.
+    """
+    colunas = list(colunas)
+    cruz = cruzamentos(df, colunas)
+    if metrica == 'theil_u':
+        matriz = theil_u_pares(cruz)
+    else:
+        matriz = qui_quadrado_pares(cruz)['cramer_v']
+        np.fill_diagonal(matriz, 1.0)
+    return pd.DataFrame(matriz, index=colunas, columns=colunas)
+
+
+def bootstrap_proporcoes(contagens, n_boot=2000, seed=42, nivel=0.95):
+    """
+    Intervalos de confiança percentis para as proporções de cada linha de `contagens` (grupos x
+    categorias). Todas as réplicas são sorteadas de uma vez com distribuições multinomiais sobre as
+    contagens de cada grupo, sem reamostrar o DataFrame. Devolve (inferior, superior), no formato de
+    `contagens`.
+    """
+    contagens = np.asarray(contagens, dtype=np.int64)
+    n = contagens.sum(axis=1)
+    k = contagens.shape[1]
+    # Grupos vazios sorteiam zero respostas; a proporção uniforme só evita pvals inválidos
+    p = np.where(n[:, None] > 0, contagens / np.maximum(n, 1)[:, None], 1 / k)
+
+    rng = np.random.default_rng(seed)
+    replicas = rng.multinomial(n, p, size=(n_boot, len(n))) / np.maximum(n, 1)[:, None]
+    alfa = (1 - nivel) / 2
+    inferior, superior = np.quantile(replicas, [alfa, 1 - alfa], axis=0)
+    return inferior, superior
+
+
+def benjamini_hochberg(p):
+    """P-valores ajustados por Benjamini-Hochberg (NaN são ignorados)."""
+    p = np.asarray(p, dtype=float)
+    ajustados = np.full_like(p, np.nan)
+    validos = ~np.isnan(p)
+    if validos.any():
+        ajustados[validos] = stats.false_discovery_control(p[validos], method='bh')
+    return ajustados
+
+
+@cache_por_versao(max_entries=16)
+def associacoes_qui_quadrado(df, colunas=None):
+    """
+    Tabela com um par de colunas por linha: qui-quadrado, graus de liberdade, p-valor, p-valor
+    ajustado (Benjamini-Hochberg sobre todos os pares), V de Cramér e n. Ordenada pelo V de Cramér.
+    """
+    cruz = cruzamentos(df, colunas)
+    resultado = qui_quadrado_pares(cruz)
+    i, j = np.triu_indices(len(cruz['colunas']), k=1)
+    colunas = np.array(cruz['colunas'])
+    tabela = pd.DataFrame({
+        'variavel_a': colunas[i],
+        'variavel_b': colunas[j],
+        'chi2': resultado['chi2'][i, j],
+        'gl': resultado['gl'][i, j].astype(int),
+        'p': resultado['p'][i, j],
+        'cramer_v': resultado['cramer_v'][i, j],
+        'n': resultado['n'][i, j].astype(int),
+    })
+    tabela.insert(5, 'p_ajustado', benjamini_hochberg(tabela['p']))
+    return tabela.sort_values('cramer_v', ascending=False, ignore_index=True)
+
+
+def resultado_par(tabela, a, b):
+    """Linha da tabela de associações do par (a, b), em qualquer ordem."""
+    par = ((tabela['variavel_a'] == a) & (tabela['variavel_b'] == b)) | \
+          ((tabela['variavel_a'] == b) & (tabela['variavel_b'] == a))
+    return tabela[par].iloc[0]
+
+
+def matriz_simetrica(tabela, valor, colunas=None):
+    """Tabela de pares (variavel_a, variavel_b) de volta a uma matriz quadrada simétrica."""
+    colunas = list(colunas or dict.fromkeys([*tabela['variavel_a'], *tabela['variavel_b']]))
+    posicao = {c: k for k, c in enumerate(colunas)}
+    a, b = tabela['variavel_a'].map(posicao).to_numpy(), tabela['variavel_b'].map(posicao).to_numpy()
+    matriz = np.full((len(colunas), len(colunas)), np.nan)
+    matriz[a, b] = matriz[b, a] = tabela[valor].to_numpy()
+    return pd.DataFrame(matriz, index=colunas, columns=colunas)
@@ -0,0 +1,127 @@
+"""
+Normalização de gênero compartilhada por todas as páginas.
+
+As listas de termos são compiladas uma única vez em tabelas de consulta e a classificação é feita
+somente sobre os valores distintos da coluna: o custo depende do número de textos diferentes, não
+do número de linhas. O resultado volta para as linhas pelos códigos categóricos.
+
+Esquemas de agrupamento disponíveis (chaves de ESQUEMAS):
+
+- 'gender_group': Homem / Mulher / Trans / Não-binário. Qualquer termo contendo "trans" é Trans e
+  termos desconhecidos caem em Não-binário. É a coluna `gender_group` do dataset.
+- 'grupo': Homem / Mulher / Trans/NB. Mesmas regras, com Trans e Não-binário unidos. É a coluna `grupo`.
+- 'classificado': Homem / Mulher / Trans/NB / Outro. Listas curtas usadas na Análise Geral e no radar
+  de Comparações; termos desconhecidos caem em Outro.
+
+Para trocar de esquema em uma página basta chamar `classificar(df['gender'], esquema)`: como `gender`
+já é categórica, só as categorias são classificadas e nenhuma cópia do DataFrame é feita.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Padronização básica aplicada antes de qualquer agrupamento
+PADRONIZACAO = {
+    'male': 'male', 'm': 'male', 'man': 'male',
+    'female': 'female', 'f': 'female', 'woman': 'female',
+    'non-binary': 'non-binary', 'nb': 'non-binary',
+    'trans-female': 'trans', 'trans woman': 'trans',
+    'trans male': 'trans', 'trans man': 'trans',
+    'agender': 'non-binary', 'genderqueer': 'non-binary'
+}
+SEM_RESPOSTA = 'not specified'
+
+TERMOS_HOMEM = ['m', 'male', 'cis male', 'cis man', 'man', 'male (cis)',
+                'male-ish', 'maile', 'mal', 'msle', 'malr', 'mail', 'make',
+                'guy (-ish) ^_^', 'ostensibly male, unsure what that really means',
+                'something kinda male?', 'male leaning androgynous']
+TERMOS_MULHER = ['f', 'female', 'cis female', 'cis-female/femme', 'femail',
+                 'femake', 'female (cis)']
+TERMOS_NAO_BINARIO = ['non-binary', 'enby', 'fluid', 'androgyne', 'neuter',
+                      'queer', 'nah', 'all', 'p', 'a little about you',
+                      'queer/she/they']
+
+# Listas curtas das páginas Análise Geral e Comparações (radar)
+TERMOS_HOMEM_PAGINAS = ['male', 'm', 'man', 'cis male', 'cis man', 'male (cis)', 'make', 'mail', 'malr', 'msle', 'maile']
+TERMOS_MULHER_PAGINAS = ['female', 'f', 'woman', 'cis female', 'cis-female/femme', 'femake', 'cis woman', 'femail']
+TERMOS_TRANS_NB_PAGINAS = ['trans-female', 'trans woman', 'male to female', 'transfemale', 'non-binary', 'agender',
+                           'androgyne', 'genderqueer', 'gender fluid', 'nonbinary']
+
+
+def _tabela(*grupos):
+    tabela = {}
+    for rotulo, termos in grupos:
+        tabela.update(dict.fromkeys(termos, rotulo))
+    return tabela
+
+
+# Cada esquema: categorias (na ordem de exibição), regras por trecho contido, tabela exata e rótulo padrão
+ESQUEMAS = {
+    'gender_group': {
+        'categorias': ['Homem', 'Mulher', 'Trans', 'Não-binário'],
+        'contem': [('trans', 'Trans')],
+        'termos': _tabela(('Homem', TERMOS_HOMEM), ('Mulher', TERMOS_MULHER),
+                          ('Não-binário', TERMOS_NAO_BINARIO)),
+        'padrao': 'Não-binário',
+    },
+    'grupo': {
+        'categorias': ['Homem', 'Mulher', 'Trans/NB'],
+        'contem': [('trans', 'Trans/NB')],
+        'termos': _tabela(('Homem', TERMOS_HOMEM), ('Mulher', TERMOS_MULHER),
+                          ('Trans/NB', TERMOS_NAO_BINARIO)),
+        'padrao': 'Trans/NB',
+    },
+    'classificado': {
+        'categorias': ['Homem', 'Mulher', 'Trans/NB', 'Outro'],
+        'contem': [],
+        'termos': _tabela(('Homem', TERMOS_HOMEM_PAGINAS), ('Mulher', TERMOS_MULHER_PAGINAS),
+                          ('Trans/NB', TERMOS_TRANS_NB_PAGINAS)),
+        'padrao': 'Outro',
+    },
+}
+
+
+def classificar_termo(termo, esquema='gender_group'):
+    """Classifica um único texto de gênero segundo o esquema escolhido."""
+    regras = ESQUEMAS[esquema]
+    termo = str(termo).strip().lower()
+    for trecho, rotulo in regras['contem']:
+        if trecho in termo:
+            return rotulo
+    return regras['termos'].get(termo, regras['padrao'])
+
+
+def _codigos_e_valores(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie, use_na_sentinel=True)
+
+
+def padronizar(serie):
+    """Aplica a padronização básica (minúsculas, sinônimos, sem resposta) e devolve uma coluna categórica."""
+    codigos, valores = _codigos_e_valores(serie)
+    valores = pd.Series(valores, dtype=object).str.lower().str.strip().replace(PADRONIZACAO)
+    valores = valores.tolist() + [SEM_RESPOSTA]  # o código -1 (NaN) aponta para o último item
+    novos_codigos, categorias = pd.factorize(pd.Series(valores))
+    return pd.Series(
+        pd.Categorical.from_codes(novos_codigos[codigos], categories=categorias),
+        index=serie.index, name=serie.name
+    )
+
+
+def classificar(serie, esquema='gender_group'):
+    """
+    Agrupa uma coluna de gênero segundo o esquema escolhido (ver ESQUEMAS) e devolve uma coluna
+    categórica com as categorias do esquema. Apenas os valores distintos são classificados.
+    """
+    categorias = ESQUEMAS[esquema]['categorias']
+    posicao = {rotulo: i for i, rotulo in enumerate(categorias)}
+    codigos, valores = _codigos_e_valores(serie)
+
+    rotulos = [classificar_termo(v, esquema) for v in valores] + [classificar_termo(np.nan, esquema)]
+    tabela = np.array([posicao[r] for r in rotulos], dtype=np.int8)
+
+    return pd.Series(
+        pd.Categorical.from_codes(tabela[codigos], categories=categorias),
+        index=serie.index, name=serie.name
+    )
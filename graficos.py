@@ -0,0 +1,112 @@
+"""
+Camada de gráficos das páginas.
+
+Os gráficos são montados a partir de dados já agregados (contagens do cubo e resumos do box plot),
+nunca dos respondentes: o tamanho da figura enviada ao navegador depende do número de categorias,
+e não do número de linhas do dataset. O box plot recebe quartis e cercas prontos e no máximo
+MAX_OUTLIERS outliers por grupo.
+
+Montar uma figura com plotly.express custa dezenas de milissegundos; as figuras ficam em cache
+(st.cache_resource, compartilhado entre as sessões) pela chave do estado dos filtros. O que fica em
+cache é a figura montada, e não o JSON: st.plotly_chart sempre serializa de novo o que recebe, e
+reconstruir a figura a partir de um JSON guardado (plotly.io.from_json) custa mais que serializar a
+figura pronta. Um rerun com os mesmos filtros paga só essa serialização, de poucos milissegundos,
+já que as figuras vêm de dados agregados. Cada exibição registra na instrumentação o tempo, os
+pontos enviados e, com o painel de desempenho ou o log ligados, o tamanho do JSON da figura.
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+import instrumentacao
+
+MAX_OUTLIERS = 100
+LEGENDA_HORIZONTAL = dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5, title_text='')
+
+
+def tamanho_payload(fig):
+    """Bytes do JSON da figura, o que st.plotly_chart envia ao navegador."""
+    return len(pio.to_json(fig, validate=False).encode())
+
+
+def _pontos(fig):
+    # Pontos enviados ao navegador: tamanho da primeira coluna de dados de cada traço
+    total = 0
+    for traco in fig.data:
+        for atributo in ('x', 'values', 'r', 'z', 'y'):
+            valores = getattr(traco, atributo, None)
+            if valores is not None:
+                total += len(valores)
+                break
+    return total
+
+
+def exibir_grafico(nome, fig, tamanho=None, **opcoes):
+    """
+    st.plotly_chart medido: o tempo inclui a serialização da figura, as linhas são os pontos
+    enviados e, quando a instrumentação está detalhada, os bytes do payload.
+    """
+    if tamanho is None and instrumentacao.detalhada():
+        tamanho = tamanho_payload(fig)
+    with instrumentacao.medir(f"grafico: {nome}", linhas=_pontos(fig)) as medida:
+        medida.bytes = tamanho
+        st.plotly_chart(fig, **opcoes)
+
+
+@st.cache_resource(max_entries=256)
+def _figura(nome, chave, _construir):
+    instrumentacao.falha_cache()
+    # O tamanho do payload é calculado na primeira exibição que pedir (ver exibir)
+    return {'figura': _construir(), 'bytes': None}
+
+
+def exibir(nome, chave, construir, **opcoes):
+    """
+    Exibe a figura `nome` montada por `construir()` uma única vez por `chave` (versão do dataset e
+    estado dos filtros). Só a montagem fica em cache; a serialização é refeita por st.plotly_chart a
+    cada exibição. A figura em cache é compartilhada e não deve ser alterada.
+    """
+    with instrumentacao.medir(f"figura: {nome}", cache=True):
+        entrada = _figura(nome, chave, construir)
+    if entrada['bytes'] is None and instrumentacao.detalhada():
+        entrada['bytes'] = tamanho_payload(entrada['figura'])
+    exibir_grafico(nome, entrada['figura'], entrada['bytes'], **opcoes)
+
+
+@instrumentacao.instrumentar
+def pizza(contagens, rotulo, titulo, cores=None):
+    """Gráfico de pizza de uma série de contagens (índice = categorias)."""
+    dados = contagens.rename_axis(rotulo).reset_index(name='Quantidade')
+    fig = px.pie(dados, values='Quantidade', names=rotulo, title=titulo, color_discrete_sequence=cores)
+    fig.update_layout(legend=LEGENDA_HORIZONTAL)
+    return fig
+
+
+def amostrar_outliers(outliers, maximo=MAX_OUTLIERS):
+    """Até `maximo` outliers espaçados uniformemente na ordem dos valores (os extremos sempre entram)."""
+    outliers = np.sort(np.asarray(outliers))
+    if len(outliers) <= maximo:
+        return outliers
+    return outliers[np.linspace(0, len(outliers) - 1, maximo).round().astype(int)]
+
+
+@instrumentacao.instrumentar
+def box(resumos, grupo, titulo, rotulo_x, rotulo_y):
+    """Box plot de estatísticas pré-calculadas (ver agregacoes.resumos_box), uma caixa por linha de `resumos`."""
+    fig = go.Figure()
+    for cor, resumo in zip(px.colors.qualitative.Set2, resumos.to_dict('records')):
+        fig.add_trace(go.Box(
+            x=[resumo[grupo]], name=resumo[grupo], marker_color=cor,
+            q1=[resumo['q1']], median=[resumo['mediana']], q3=[resumo['q3']],
+            lowerfence=[resumo['cerca_inferior']], upperfence=[resumo['cerca_superior']],
+        ))
+        outliers = amostrar_outliers(resumo['outliers'])
+        fig.add_trace(go.Scatter(
+            x=[resumo[grupo]] * len(outliers), y=outliers,
+            mode='markers', marker_color=cor, showlegend=False, hoverinfo='y'
+        ))
+    fig.update_layout(title=titulo, xaxis_title=rotulo_x, yaxis_title=rotulo_y, legend_title_text=rotulo_x)
+    return fig
@@ -0,0 +1,137 @@
+"""
+Relatório do tempo de importação de cada página do app.
+
+Os imports de nível de módulo de cada página (Home.py e pages/*.py) são lidos do código-fonte e
+medidos em um processo novo com `python -X importtime`, que informa, para cada módulo importado
+pela primeira vez, o tempo próprio e o acumulado (com os submódulos). O relatório mostra o total de
+cada página, os pacotes mais caros e se a página inicial passou a importar algum pacote pesado
+(scikit-learn, scipy ou matplotlib), que devem ficar fora do caminho da navegação:
+
+    python -m importacoes --json importacoes.json
+    python -m importacoes --comparar importacoes.json   # falha se alguma página ficou mais lenta
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent
+PAGINA_INICIAL = 'Home.py'
+PESADOS = ('sklearn', 'scipy', 'matplotlib')
+REPETICOES = 3
+# Aumento do total de uma página, em relação à base, a partir do qual ela é apontada como regressão
+TOLERANCIA = 0.25
+
+_LINHA = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def paginas():
+    """Scripts do app: a página inicial seguida das páginas em pages/."""
+    return [PAGINA_INICIAL] + sorted(str(p.relative_to(RAIZ)) for p in (RAIZ / 'pages').glob('*.py'))
+
+
+def modulos_importados(caminho):
+    """Módulos importados no nível do módulo (imports dentro de funções são ignorados, pois são adiados)."""
+    arvore = ast.parse((RAIZ / caminho).read_text(encoding='utf-8'))
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos.extend(alias.name for alias in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+def _importtime(codigo):
+    # Processo novo, para medir importações a frio
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                               capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': str(RAIZ)})
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+    linhas = []
+    for linha in resultado.stderr.splitlines():
+        casamento = _LINHA.match(linha)
+        if casamento:
+            proprio, acumulado, recuo, modulo = casamento.groups()
+            linhas.append({'modulo': modulo, 'nivel': (len(recuo) - 1) // 2,
+                           'proprio_ms': int(proprio) / 1e3, 'acumulado_ms': int(acumulado) / 1e3})
+    return pd.DataFrame(linhas, columns=['modulo', 'nivel', 'proprio_ms', 'acumulado_ms'])
+
+
+def medir(modulos, repeticoes=REPETICOES):
+    """
+    Tempo de importação (ms) de cada módulo carregado ao importar `modulos`, sem os módulos que o
+    interpretador já carrega na inicialização. Fica o menor tempo entre as repetições.
+    """
+    inicializacao = set(_importtime('pass')['modulo'])
+    medidas = pd.concat([_importtime('import ' + ', '.join(modulos)) for _ in range(repeticoes)])
+    medidas = medidas[~medidas['modulo'].isin(inicializacao)]
+    return (medidas.groupby('modulo', sort=False)
+            .agg(nivel=('nivel', 'first'), proprio_ms=('proprio_ms', 'min'), acumulado_ms=('acumulado_ms', 'min'))
+            .reset_index())
+
+
+def relatorio(repeticoes=REPETICOES):
+    """Por página: total (ms), tempo de cada import direto, tempo próprio por pacote e pacotes pesados."""
+    resultado = {}
+    for pagina in paginas():
+        modulos = modulos_importados(pagina)
+        medidas = medir(modulos, repeticoes)
+        pacotes = medidas.groupby(medidas['modulo'].str.split('.').str[0])['proprio_ms'].sum()
+        diretos = medidas[medidas['nivel'] == 0].set_index('modulo')['acumulado_ms']
+        resultado[pagina] = {
+            'total_ms': round(float(diretos.sum()), 1),
+            'modulos': len(medidas),
+            'imports': {m: round(float(v), 1) for m, v in diretos.sort_values(ascending=False).items()},
+            'pacotes': {p: round(float(v), 1) for p, v in pacotes.sort_values(ascending=False).items()},
+            'pesados': sorted(set(pacotes.index) & set(PESADOS)),
+        }
+    return resultado
+
+
+def regressoes(atual, base, tolerancia=TOLERANCIA):
+    """Mensagens das páginas mais lentas que a base além da tolerância e dos pacotes pesados na página inicial."""
+    problemas = []
+    for pagina, dados in atual.items():
+        anterior = base.get(pagina, {}).get('total_ms')
+        if anterior and dados['total_ms'] > anterior * (1 + tolerancia):
+            problemas.append(f"{pagina}: {anterior:.0f} ms -> {dados['total_ms']:.0f} ms")
+    pesados = atual.get(PAGINA_INICIAL, {}).get('pesados')
+    if pesados:
+        problemas.append(f"{PAGINA_INICIAL} importa {', '.join(pesados)}")
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m importacoes',
+                                     description="Tempo de importação (ms) de cada página do app.")
+    parser.add_argument('--json', help="grava o relatório completo neste arquivo")
+    parser.add_argument('--comparar', help="relatório base (JSON) para apontar regressões")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--top', type=int, default=8, help="pacotes listados por página")
+    args = parser.parse_args(argv)
+
+    atual = relatorio(args.repeticoes)
+    for pagina, dados in atual.items():
+        pesados = f" (pesados: {', '.join(dados['pesados'])})" if dados['pesados'] else ''
+        print(f"{pagina}: {dados['total_ms']:.0f} ms, {dados['modulos']} módulos{pesados}")
+        for pacote, ms in list(dados['pacotes'].items())[:args.top]:
+            print(f"    {pacote:<24}{ms:>9.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(atual, indent=2, ensure_ascii=False))
+    problemas = regressoes(atual, json.loads(Path(args.comparar).read_text()) if args.comparar else {})
+    for problema in problemas:
+        print(f"REGRESSÃO: {problema}")
+    return 1 if problemas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Ingestão incremental de respostas novas da pesquisa.
+
+Cada lote (um CSV com as colunas do survey) passa pela mesma normalização do app (nomes das
+colunas, grupos de gênero e esquema de tipos) e é gravado como um segmento do snapshot em disco
+(utils.anexar_segmento): o CSV de origem não é relido e o que já está no snapshot não é regravado.
+Cada segmento cria uma nova versão do dataset, que as sessões abertas passam a ver no próximo rerun.
+
+Os agregados aditivos nas linhas (cubo da Análise Geral, contagens das tabelas de contingência e a
+matriz de Gram das associações) usam utils.cache_incremental: na versão nova, só as linhas do
+segmento são processadas e somadas ao resultado anterior. O classificador e o clustering não são
+refeitos a cada lote: seguem a versão de referência, a última em que a política de retreino pediu um
+novo treino. Um treino novo acontece quando os respondentes anexados desde a referência passam de
+LIMIAR_LINHAS da base de treino ou quando a distribuição de alguma feature entre eles (ou só no
+último lote) se afasta da base de treino mais que LIMIAR_DERIVA (variação total):
+
+    python -m ingestao anexar respostas-novas.csv
+    python -m ingestao estado
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import agregacoes
+import utils
+from utils import cache_por_versao
+
+# Respondentes novos, em fração da base de treino, a partir dos quais os modelos são refeitos
+LIMIAR_LINHAS = 0.2
+# Variação total máxima aceita entre as distribuições de uma feature (base de treino x novos)
+LIMIAR_DERIVA = 0.1
+# Com menos respondentes novos que isso, a deriva é só ruído de amostragem e não é avaliada
+MIN_LINHAS_DERIVA = 200
+# Features do classificador e do clustering, mais o alvo do classificador
+COLUNAS_DERIVA = ['age', 'gender_group', 'family_history', 'benefits', 'care_options', 'anonymity', 'leave',
+                  'work_interfere', 'remote_work', 'tech_company', 'treatment']
+
+
+def _distribuicao(serie):
+    if serie.name == 'age':
+        serie = pd.cut(serie, bins=agregacoes.FAIXAS_ETARIAS, labels=agregacoes.ROTULOS_FAIXAS)
+    codigos = serie.cat.codes.to_numpy()
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories))
+    return contagens / max(contagens.sum(), 1)
+
+
+def deriva(referencia, novos, colunas=COLUNAS_DERIVA):
+    """Variação total entre as distribuições de cada coluna em `referencia` e em `novos` (idade em faixas)."""
+    return pd.Series({coluna: 0.5 * np.abs(_distribuicao(referencia[coluna]) - _distribuicao(novos[coluna])).sum()
+                      for coluna in colunas}, name='deriva')
+
+
+def decidir(referencia, novos, segmento=None):
+    """
+    Se os modelos treinados com `referencia` devem ser refeitos com os respondentes `novos` (todos
+    os anexados desde o treino), e por quê. A deriva também é medida só no último `segmento`, para
+    que um lote muito diferente não se dilua entre os anteriores.
+    """
+    decisao = {'novos': len(novos), 'retreinar': False, 'motivo': None, 'deriva': None, 'coluna': None}
+    amostras = [amostra for amostra in (novos, segmento)
+                if amostra is not None and len(amostra) >= MIN_LINHAS_DERIVA]
+    if amostras:
+        distancias = pd.concat([deriva(referencia, amostra) for amostra in amostras], axis=1).max(axis=1)
+        decisao['deriva'], decisao['coluna'] = float(distancias.max()), distancias.idxmax()
+        if decisao['deriva'] > LIMIAR_DERIVA:
+            decisao['retreinar'] = True
+            decisao['motivo'] = f"deriva de {decisao['deriva']:.3f} em '{decisao['coluna']}'"
+    if not decisao['retreinar'] and len(novos) > LIMIAR_LINHAS * len(referencia):
+        decisao['retreinar'] = True
+        decisao['motivo'] = f"{len(novos)} respondentes novos ({len(novos) / len(referencia):.0%} da base de treino)"
+    return decisao
+
+
+@cache_por_versao(max_entries=4)
+def referencia_modelagem(df):
+    """
+    Posição, no histórico de versões do dataset, da versão com que os modelos devem ser treinados,
+    junto com a decisão da política para cada segmento anexado. Percorre os segmentos na ordem: a
+    referência avança para um segmento quando os respondentes acumulados desde ela pedem um treino.
+    """
+    versoes, linhas = df.attrs.get('versoes') or [utils.versao(df)], df.attrs.get('linhas_versoes') or [len(df)]
+    indice, decisoes = 0, []
+    for i in range(1, len(versoes)):
+        decisao = decidir(df.iloc[:linhas[indice]], df.iloc[linhas[indice]:linhas[i]],
+                          segmento=df.iloc[linhas[i - 1]:linhas[i]])
+        decisoes.append({'versao': versoes[i], **decisao})
+        if decisao['retreinar']:
+            indice = i
+    return {'indice': indice, 'versao': versoes[indice], 'linhas': linhas[indice], 'decisoes': decisoes}
+
+
+def recorte_modelagem(df):
+    """
+    Visão de `df` só com as linhas da versão de referência (ver referencia_modelagem), com a versão
+    dela: o modelo e o clustering são os mesmos enquanto a política não pedir um novo treino.
+    """
+    versoes, linhas = df.attrs.get('versoes'), df.attrs.get('linhas_versoes')
+    if not versoes or len(versoes) == 1 or len(df) != linhas[-1]:
+        return df
+    indice = referencia_modelagem(df)['indice']
+    if indice == len(versoes) - 1:
+        return df
+    recorte = df.iloc[:linhas[indice]]
+    recorte.attrs = {'versao': versoes[indice], 'versoes': versoes[:indice + 1],
+                     'linhas_versoes': linhas[:indice + 1]}
+    return recorte
+
+
+def anexar(lote, origem=None, treinar=True):
+    """
+    Anexa um lote (DataFrame ou caminho de CSV) ao snapshot da origem. Quando a política pede um
+    novo treino, o classificador é treinado e gravado no registro aqui mesmo, fora do app.
+    Devolve os metadados do segmento e a referência de modelagem do dataset resultante.
+    """
+    if not isinstance(lote, pd.DataFrame):
+        lote = pd.read_csv(lote)
+    segmento = utils.anexar_segmento(lote, origem)
+    df = utils.carregar_dataset(origem)
+    referencia = referencia_modelagem(df)
+    if treinar and referencia['versao'] == segmento['versao']:
+        # Importado só aqui: o scikit-learn não pesa nas páginas que usam a ingestão
+        import modelo
+        modelo.obter_modelo(df)
+    return segmento, referencia
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ingestao',
+                                     description="Ingestão incremental de respostas novas da pesquisa.")
+    parser.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    cmd_anexar = comandos.add_parser('anexar', help="normaliza e anexa lotes de respostas ao snapshot")
+    cmd_anexar.add_argument('lotes', nargs='+', help="CSVs com as colunas do survey")
+    cmd_anexar.add_argument('--sem-treino', action='store_true',
+                            help="não treina o classificador agora, mesmo que a política peça (o app treina)")
+    comandos.add_parser('estado', help="segmentos anexados e decisões da política de retreino")
+    comandos.add_parser('descartar', help="remove os segmentos anexados (o dataset volta a ser só o CSV)")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'anexar':
+        for lote in args.lotes:
+            segmento, referencia = anexar(lote, args.origem, treinar=not args.sem_treino)
+            retreino = "modelos refeitos" if referencia['versao'] == segmento['versao'] else "modelos mantidos"
+            print(f"{lote}: {segmento['linhas']} respostas anexadas (versão {segmento['versao']}, {retreino})")
+    elif args.comando == 'estado':
+        df = utils.carregar_dataset(args.origem)
+        referencia = referencia_modelagem(df)
+        print(f"Dataset {utils.versao(df)}: {len(df)} respondentes, {len(referencia['decisoes'])} segmentos anexados")
+        print(f"Modelos treinados com a versão {referencia['versao']} ({referencia['linhas']} respondentes)")
+        if referencia['decisoes']:
+            decisoes = pd.DataFrame(referencia['decisoes'])
+            with pd.option_context('display.width', 200, 'display.max_columns', None):
+                print(decisoes.round(3).to_string(index=False))
+    elif args.comando == 'descartar':
+        print(f"{utils.descartar_segmentos(args.origem)} segmentos descartados")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
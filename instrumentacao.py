@@ -0,0 +1,194 @@
+"""
+Instrumentação dos caminhos críticos do app.
+
+`medir` (gerenciador de contexto) e `instrumentar` (decorador) registram a duração de cada etapa, o
+número de linhas processadas (e de bytes produzidos, nos gráficos) e, para funções em cache, se a
+chamada foi um acerto ou uma falha do cache. As medidas de uma execução (rerun) da página ficam no
+registro da thread do script, aberto por `iniciar_execucao` em Home.py e exibido no painel de
+desempenho da barra lateral (`?debug=1` na URL ou SURVEY_DEBUG=1). Fora do Streamlit, ou em threads
+em segundo plano, as medidas só vão para o log.
+
+Com SURVEY_LOG_INSTRUMENTACAO definida ('-' para stderr ou um caminho de arquivo), cada medida e o
+resumo de cada execução são gravados como uma linha JSON, prontos para agregação.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+# Só emite quando configurado (ver _configurar_log); não se mistura aos logs dos comandos de linha
+logger.propagate = False
+
+ACERTO, FALHA = 'acerto', 'falha'
+
+_local = threading.local()
+
+
+def _configurar_log():
+    destino = os.environ.get('SURVEY_LOG_INSTRUMENTACAO')
+    if not destino:
+        return
+    handler = logging.StreamHandler() if destino == '-' else logging.FileHandler(destino)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+_configurar_log()
+
+
+def _log(evento, **campos):
+    if logger.handlers:
+        logger.info(json.dumps({'evento': evento, 'momento': time.time(), **campos}, ensure_ascii=False, default=str))
+
+
+class Medida:
+    """Uma etapa medida: nome, duração (ms), linhas, bytes, resultado do cache e nível de aninhamento."""
+
+    __slots__ = ('nome', 'nivel', 'ms', 'linhas', 'bytes', 'cache', 'inicio')
+
+    def __init__(self, nome, nivel, linhas=None, cache=None):
+        self.nome, self.nivel, self.linhas, self.cache = nome, nivel, linhas, cache
+        self.ms = self.bytes = None
+        self.inicio = time.perf_counter()
+
+    def como_dicionario(self):
+        return {'nome': self.nome, 'nivel': self.nivel, 'ms': self.ms, 'linhas': self.linhas,
+                'bytes': self.bytes, 'cache': self.cache}
+
+
+@contextmanager
+def medir(nome, linhas=None, cache=False):
+    """
+    Mede o bloco. Com `cache=True`, a medida começa como acerto e vira falha se a função em cache
+    chamar `falha_cache` (o corpo de uma função em cache só roda nas falhas). As linhas e os bytes
+    produzidos podem ser informados depois, em `medida.linhas` e `medida.bytes`.
+    """
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    medida = Medida(nome, len(pilha), linhas, ACERTO if cache else None)
+    pilha.append(medida)
+    try:
+        yield medida
+    finally:
+        medida.ms = (time.perf_counter() - medida.inicio) * 1e3
+        pilha.pop()
+        registros = getattr(_local, 'registros', None)
+        if registros is not None:
+            registros.append(medida)
+        _log('medida', execucao=getattr(_local, 'execucao', None), **medida.como_dicionario())
+
+
+def falha_cache():
+    """Marca como falha de cache a medida em andamento; chamada no corpo das funções em cache."""
+    pilha = getattr(_local, 'pilha', None)
+    if pilha and pilha[-1].cache is not None:
+        pilha[-1].cache = FALHA
+
+
+def nome_funcao(func):
+    # Páginas rodam como __main__: nelas basta o nome da função
+    return func.__qualname__ if func.__module__ == '__main__' else f"{func.__module__}.{func.__qualname__}"
+
+
+def instrumentar(func=None, *, nome=None):
+    """Decorador que mede cada chamada da função (ver medir)."""
+    if func is None:
+        return functools.partial(instrumentar, nome=nome)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with medir(nome or nome_funcao(func)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def em_cache(cache=st.cache_data, nome=None, **opcoes):
+    """
+    st.cache_data (ou st.cache_resource, em `cache`) com a chamada medida e o acerto ou a falha do
+    cache registrados. Os argumentos e o código da função continuam definindo a chave do cache.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def corpo(*args, **kwargs):
+            falha_cache()
+            return func(*args, **kwargs)
+        cacheada = cache(**opcoes)(corpo)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with medir(nome or nome_funcao(func), cache=True):
+                return cacheada(*args, **kwargs)
+
+        wrapper.clear = cacheada.clear
+        return wrapper
+    return decorador
+
+
+def iniciar_execucao(pagina=None):
+    """Abre o registro de medidas da execução atual do script (chamada no início de cada rerun)."""
+    _local.registros = []
+    _local.pilha = []
+    _local.execucao = uuid.uuid4().hex[:12]
+    _local.pagina = pagina
+    _local.inicio = time.perf_counter()
+
+
+def finalizar_execucao(memoria=None):
+    """
+    Fecha o registro da execução atual e devolve o resumo: página, duração total (ms), medidas e a
+    memória do dataset da sessão em bytes (total, própria e compartilhada), quando informada.
+    """
+    registros = getattr(_local, 'registros', None)
+    if registros is None:
+        return None
+    resumo = {
+        'execucao': _local.execucao, 'pagina': _local.pagina,
+        'ms': (time.perf_counter() - _local.inicio) * 1e3,
+        # Na ordem em que as etapas começaram (cada etapa antes das que ela contém)
+        'medidas': [medida.como_dicionario() for medida in sorted(registros, key=lambda m: m.inicio)],
+        'memoria': memoria,
+    }
+    _local.registros = None
+    _log('execucao', **{**resumo, 'medidas': len(registros),
+                        'falhas_cache': sum(m.cache == FALHA for m in registros)})
+    return resumo
+
+
+def painel_ativo():
+    """Painel de desempenho ligado por `?debug=1` na URL ou pela variável SURVEY_DEBUG."""
+    return st.query_params.get('debug') in ('1', 'true') or os.environ.get('SURVEY_DEBUG') in ('1', 'true')
+
+
+def detalhada():
+    """Se vale a pena calcular medidas extras (ex.: tamanho dos gráficos): painel ou log ligados."""
+    return bool(logger.handlers) or painel_ativo()
+
+
+def painel(resumo):
+    """Tabela das medidas de uma execução na barra lateral, na ordem em que foram abertas."""
+    if not resumo:
+        return
+    medidas = (pd.DataFrame(resumo['medidas'], columns=['nome', 'nivel', 'ms', 'linhas', 'bytes', 'cache'])
+               .astype({'linhas': 'Int64', 'bytes': 'Int64'}))
+    medido = medidas.loc[medidas['nivel'] == 0, 'ms'].sum()
+    with st.sidebar.expander("⏱️ Desempenho desta execução", expanded=True):
+        st.caption(f"{resumo['pagina']}: {resumo['ms']:.0f} ms no total, {medido:.0f} ms nas etapas medidas "
+                   f"({(medidas['cache'] == ACERTO).sum()} acertos e {(medidas['cache'] == FALHA).sum()} "
+                   f"falhas de cache)")
+        if resumo.get('memoria'):
+            memoria = {chave: valor / 2**20 for chave, valor in resumo['memoria'].items()}
+            st.caption(f"Dataset da sessão: {memoria['total']:.1f} MB, {memoria['propria']:.1f} MB próprios e "
+                       f"{memoria['compartilhada']:.1f} MB compartilhados com o processo")
+        medidas['nome'] = ['  ' * nivel + nome for nivel, nome in zip(medidas['nivel'], medidas['nome'])]
+        st.dataframe(medidas.drop(columns='nivel').round({'ms': 1}), hide_index=True, use_container_width=True)
@@ -0,0 +1,235 @@
+"""
+Registro do modelo de classificação (busca por tratamento).
+
+O modelo é treinado fora do app (`python -m modelo treinar`) e gravado em `modelos/` (ou em
+SURVEY_MODEL_DIR): o Pipeline ajustado vai para um arquivo joblib sem compressão, que pode ser
+carregado mapeado em memória, e os metadados (features, versão do dataset, métricas, versão do
+scikit-learn, índices de teste e a avaliação completa no conjunto de teste) vão para um JSON ao
+lado. A página de Classificação carrega o artefato compatível com o dataset atual e só treina
+quando não há nenhum. Respostas anexadas ao dataset (ver ingestao.py) não invalidam o artefato: o
+modelo é o da versão de referência da política de retreino até que ela peça um novo treino.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import (accuracy_score, average_precision_score, confusion_matrix, precision_recall_curve,
+                             precision_score, recall_score, roc_auc_score, roc_curve)
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+import ingestao
+import utils
+from instrumentacao import instrumentar
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_MODELOS = Path(os.environ.get('SURVEY_MODEL_DIR', Path(__file__).resolve().parent / 'modelos'))
+# Incrementar sempre que preparar_dados ou construir_pipeline mudarem, para invalidar artefatos antigos
+VERSAO_MODELO = 2
+
+FEATURES = ['age', 'gender_group', 'family_history', 'benefits', 'care_options', 'anonymity', 'leave', 'work_interfere']
+ALVO = 'treatment'
+
+
+@instrumentar
+def preparar_dados(df):
+    """Features e alvo (1 = buscou tratamento) dos respondentes com idade entre 15 e 80 anos."""
+    df_model = df[FEATURES + [ALVO]].copy()
+
+    df_model['work_interfere'] = df_model['work_interfere'].cat.add_categories('Não sabe').fillna('Não sabe')
+    df_model = df_model[(df_model['age'] >= 15) & (df_model['age'] <= 80)]
+
+    df_model[ALVO] = df_model[ALVO].map({'Yes': 1, 'No': 0})
+    df_model = df_model.dropna(subset=[ALVO])
+    df_model[ALVO] = df_model[ALVO].astype(int)
+
+    return df_model[FEATURES], df_model[ALVO]
+
+
+def construir_pipeline(X, classificador=None):
+    """Pré-processamento (imputação + one-hot) seguido do classificador; por padrão, a RandomForest original."""
+    categorical_features = X.select_dtypes(include=['object', 'category']).columns
+    numerical_features = X.select_dtypes(include=np.number).columns
+
+    numerical_transformer = SimpleImputer(strategy='median')
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore'))
+    ])
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numerical_transformer, numerical_features),
+            ('cat', categorical_transformer, categorical_features)
+        ])
+
+    if classificador is None:
+        classificador = RandomForestClassifier(random_state=42, n_estimators=100)
+    return Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classificador)])
+
+
+def dividir(X, y):
+    """Divisão fixa 80/20 (estratificada) entre treino e teste, compartilhada pelo treino e pela seleção."""
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+
+@instrumentar
+def treinar(X, y, classificador=None):
+    """Ajusta o Pipeline com 80% dos dados e mede o desempenho nos 20% restantes."""
+    X_train, X_test, y_train, y_test = dividir(X, y)
+    pipeline = construir_pipeline(X, classificador).fit(X_train, y_train)
+
+    return pipeline, {'estimador': type(pipeline.named_steps['classifier']).__name__,
+                      'indices_teste': X_test.index.tolist(), **avaliar(pipeline, X_test, y_test)}
+
+
+def _origem_features(preprocessor):
+    # Coluna original de cada feature na saída do ColumnTransformer (o one-hot repete a coluna)
+    origem = []
+    for nome, transformador, colunas in preprocessor.transformers_:
+        if nome == 'num':
+            origem.extend(colunas)
+        elif nome == 'cat':
+            for coluna, categorias in zip(colunas, transformador.named_steps['onehot'].categories_):
+                origem.extend([coluna] * len(categorias))
+    return origem
+
+
+def _arredondar(valores):
+    return np.round(np.asarray(valores, dtype=float), 4).tolist()
+
+
+def avaliar(pipeline, X_test, y_test):
+    """
+    Avaliação feita uma única vez, no treino, e guardada com o artefato: métricas, matriz de
+    confusão, curvas ROC e precisão-recall e importância de cada feature (somando as colunas
+    one-hot; na regressão logística, o valor absoluto dos coeficientes), normalizada para somar 1.
+    """
+    probabilidades = pipeline.predict_proba(X_test)
+    y_pred = pipeline.classes_[np.argmax(probabilidades, axis=1)]
+    probabilidades = probabilidades[:, list(pipeline.classes_).index(1)]
+
+    fpr, tpr, _ = roc_curve(y_test, probabilidades)
+    precisao, revocacao, _ = precision_recall_curve(y_test, probabilidades)
+
+    classificador = pipeline.named_steps['classifier']
+    pesos = getattr(classificador, 'feature_importances_', None)
+    if pesos is None:
+        pesos = np.abs(classificador.coef_[0])
+    importancias = pd.Series(pesos).groupby(_origem_features(pipeline.named_steps['preprocessor'])).sum()
+    importancias = (importancias / importancias.sum()).sort_values(ascending=False)
+
+    return {
+        'metricas': {
+            'acuracia': accuracy_score(y_test, y_pred),
+            'precisao': precision_score(y_test, y_pred),
+            'recall': recall_score(y_test, y_pred),
+            'roc_auc': roc_auc_score(y_test, probabilidades),
+            'precisao_media': average_precision_score(y_test, probabilidades),
+        },
+        'avaliacao': {
+            'matriz_confusao': confusion_matrix(y_test, y_pred, labels=[0, 1]).tolist(),
+            'roc': {'fpr': _arredondar(fpr), 'tpr': _arredondar(tpr)},
+            'precisao_recall': {'precisao': _arredondar(precisao), 'recall': _arredondar(revocacao)},
+            'importancias': {coluna: round(float(v), 4) for coluna, v in importancias.items()},
+        },
+    }
+
+
+def _caminhos_artefato(versao_dataset):
+    nome = f"classificador-{versao_dataset}"
+    return DIRETORIO_MODELOS / f"{nome}.joblib", DIRETORIO_MODELOS / f"{nome}.json"
+
+
+def salvar(pipeline, info, versao_dataset):
+    """Grava o Pipeline e seus metadados no registro; devolve os metadados."""
+    meta = {
+        'versao_modelo': VERSAO_MODELO,
+        'versao_dataset': versao_dataset,
+        'sklearn': sklearn.__version__,
+        'features': FEATURES,
+        'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        **info,
+    }
+    caminho, caminho_meta = _caminhos_artefato(versao_dataset)
+    # Escrita atômica, como no snapshot do dataset: o app pode estar lendo o registro
+    try:
+        DIRETORIO_MODELOS.mkdir(parents=True, exist_ok=True)
+        tmp = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+        joblib.dump(pipeline, tmp)
+        os.replace(tmp, caminho)
+        tmp_meta = caminho_meta.with_name(f"{caminho_meta.name}.{os.getpid()}.tmp")
+        tmp_meta.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp_meta, caminho_meta)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o modelo em %s: %s", DIRETORIO_MODELOS, e)
+    return meta
+
+
+def carregar(versao_dataset):
+    """
+    Pipeline e metadados do artefato treinado com esta versão do dataset, carregado com mmap.
+    Devolve None quando não há artefato ou ele é incompatível (formato, features ou scikit-learn).
+    """
+    caminho, caminho_meta = _caminhos_artefato(versao_dataset)
+    try:
+        meta = json.loads(caminho_meta.read_text())
+    except (OSError, ValueError):
+        return None
+    if (meta.get('versao_modelo') != VERSAO_MODELO or meta.get('features') != FEATURES
+            or meta.get('sklearn') != sklearn.__version__):
+        return None
+    try:
+        return joblib.load(caminho, mmap_mode='r'), meta
+    except Exception as e:
+        logger.warning("Artefato %s ilegível, o modelo será retreinado: %s", caminho, e)
+        return None
+
+
+def identificador(meta):
+    """Identificador do artefato treinado, usado para separar caches de modelos diferentes."""
+    return f"{meta['versao_dataset']}@{meta['criado_em']}"
+
+
+def obter_modelo(df):
+    """Modelo do registro para o dataset `df`; treina e grava um novo quando não existe artefato compatível."""
+    df = ingestao.recorte_modelagem(df)
+    versao_dataset = utils.versao(df)
+    artefato = carregar(versao_dataset)
+    if artefato is not None:
+        return artefato
+    pipeline, info = treinar(*preparar_dados(df))
+    return pipeline, salvar(pipeline, info, versao_dataset)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m modelo', description="Registro do modelo de classificação.")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    cmd_treinar = comandos.add_parser('treinar', help="treina o modelo e grava o artefato no registro")
+    cmd_treinar.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'treinar':
+        df = ingestao.recorte_modelagem(utils.carregar_dataset(args.origem))
+        inicio = time.perf_counter()
+        pipeline, info = treinar(*preparar_dados(df))
+        meta = salvar(pipeline, info, utils.versao(df))
+        print(f"Modelo treinado em {time.perf_counter() - inicio:.1f}s para o dataset {meta['versao_dataset']}")
+        print(json.dumps(meta['metricas'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,13 @@
 
 import streamlit as st
 import pandas as pd
-from utils import load_data
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, ConfusionMatrixDisplay
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.impute import SimpleImputer
-import numpy as np
-import matplotlib.pyplot as plt
+import instrumentacao
+from graficos import exibir_grafico
+from utils import load_data, versao, cache_por_versao
+import ingestao
+import modelo
+from preditor import PreditorRapido, CachePrevisoes
+import plotly.express as px
 
 st.set_page_config(layout="wide")
 st.title("Análise de Perfil de Saúde Mental")
@@ -20,61 +17,37 @@ O objetivo é oferecer um **ponto de partida** para a reflexão sobre a necessid
 """)
 
 
-@st.cache_data
-def prepare_data():
-    df = load_data()
-    
-    features = [
-        'age', 'gender_group', 'family_history', 'benefits', 'care_options', 
-        'anonymity', 'leave', 'work_interfere'
-    ]
-    target = 'treatment'
-    
-    df_model = df[features + [target]].copy()
+@cache_por_versao(max_entries=2)
+def prepare_data(df):
+    return modelo.preparar_dados(df)
 
-    df_model['work_interfere'] = df_model['work_interfere'].fillna('Não sabe')
-    df_model = df_model[(df_model['age'] >= 15) & (df_model['age'] <= 80)]
-    
-    df_model[target] = df_model[target].map({'Yes': 1, 'No': 0})
-    df_model = df_model.dropna(subset=[target])
-    df_model[target] = df_model[target].astype(int)
 
-    X = df_model[features]
-    y = df_model[target]
-    
-    return X, y
+@instrumentacao.em_cache(st.cache_resource)
+def train_model(_df, versao_dataset):
+    # Carrega o artefato do registro (treinado com `python -m modelo treinar`); só treina aqui
+    # quando não existe um compatível com esta versão do dataset. A chave é a versão de referência
+    # da política de retreino: respostas anexadas não recarregam o modelo até ela pedir um treino
+    return modelo.obter_modelo(_df)
 
-X, y = prepare_data()
 
+@instrumentacao.em_cache(st.cache_resource)
+def fast_predictor(_df, versao_dataset):
+    # Floresta achatada em arrays NumPy para as previsões do formulário (mesmas probabilidades do Pipeline)
+    model, meta = train_model(_df, versao_dataset)
+    return PreditorRapido(model, versao=modelo.identificador(meta))
 
-@st.cache_resource
-def train_model(X, y):
-    categorical_features = X.select_dtypes(include=['object', 'category']).columns
-    numerical_features = X.select_dtypes(include=np.number).columns
 
-    numerical_transformer = SimpleImputer(strategy='median')
-    categorical_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='most_frequent')),
-        ('onehot', OneHotEncoder(handle_unknown='ignore'))
-    ])
+@instrumentacao.em_cache(st.cache_resource)
+def prediction_cache():
+    # Compartilhado entre as sessões; as chaves incluem a versão do modelo
+    return CachePrevisoes(max_bytes=32 * 1024 * 1024)
 
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', numerical_transformer, numerical_features),
-            ('cat', categorical_transformer, categorical_features)
-        ])
 
-    model_pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                                     ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))])
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-    
-    model_pipeline.fit(X_train, y_train)
-    
-    return model_pipeline, X_test, y_test
-
-
-model, X_test, y_test = train_model(X, y)
+df = load_data()
+X, y = prepare_data(df)
+versao_modelo = versao(ingestao.recorte_modelagem(df))
+model, meta_modelo = train_model(df, versao_modelo)
+preditor = fast_predictor(df, versao_modelo)
 
 
 st.header("Recomendação Personalizada")
@@ -88,13 +61,6 @@ opcoes_pt = {
     'interferencia_trabalho': ['Nunca', 'Raramente', 'Às vezes', 'Frequentemente', 'Não sabe']
 }
 
-mapa_pt_para_en = {
-    'Não': 'No', 'Sim': 'Yes', 'Não sei': "Don't know", 'Não tenho certeza': 'Not sure',
-    'Um pouco fácil': 'Somewhat easy', 'Muito fácil': 'Very easy', 'Um pouco difícil': 'Somewhat difficult',
-    'Muito difícil': 'Very difficult', 'Nunca': 'Never', 'Raramente': 'Rarely',
-    'Às vezes': 'Sometimes', 'Frequentemente': 'Often'
-}
-
 with st.form("prediction_form"):
     st.subheader("Insira as características do perfil:")
     col1, col2 = st.columns(2)
@@ -112,21 +78,14 @@ with st.form("prediction_form"):
     submit_button = st.form_submit_button(label="Analisar Perfil")
 
 if submit_button:
-    family_history_en = mapa_pt_para_en[family_history_pt]
-    benefits_en = mapa_pt_para_en[benefits_pt]
-    care_options_en = mapa_pt_para_en[care_options_pt]
-    anonymity_en = mapa_pt_para_en[anonymity_pt]
-    leave_en = mapa_pt_para_en[leave_pt]
-    work_interfere_en = mapa_pt_para_en[work_interfere_pt]
-
-    input_data = pd.DataFrame({
-        'age': [age], 'gender_group': [gender_group], 'family_history': [family_history_en],
-        'benefits': [benefits_en], 'care_options': [care_options_en], 'anonymity': [anonymity_en],
-        'leave': [leave_en], 'work_interfere': [work_interfere_en]
-    })
-    
-    prediction_proba = model.predict_proba(input_data)[0]
-    probability_yes = prediction_proba[1]
+    # O preditor aceita os rótulos em português do formulário diretamente
+    perfil = {
+        'age': age, 'gender_group': gender_group, 'family_history': family_history_pt,
+        'benefits': benefits_pt, 'care_options': care_options_pt, 'anonymity': anonymity_pt,
+        'leave': leave_pt, 'work_interfere': work_interfere_pt
+    }
+    # Perfis repetidos são respondidos pelo cache, sem percorrer a floresta
+    probability_yes = prediction_cache().obter(preditor.chave(perfil), lambda: preditor.probabilidade(perfil))
 
     st.subheader("Resultado da Análise")
     if probability_yes > 0.5:
@@ -140,10 +99,10 @@ if submit_button:
 with st.expander("Ver detalhes técnicos e desempenho do modelo"):
     st.header("Avaliação de Desempenho do Modelo")
 
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
+    # Métricas medidas no conjunto de teste no momento do treino, guardadas no registro
+    accuracy = meta_modelo['metricas']['acuracia']
+    precision = meta_modelo['metricas']['precisao']
+    recall = meta_modelo['metricas']['recall']
 
     kpi1, kpi2, kpi3 = st.columns(3)
     kpi1.metric("Acurácia", f"{accuracy:.2%}")
@@ -155,10 +114,63 @@ with st.expander("Ver detalhes técnicos e desempenho do modelo"):
     - **Precisão:** Dos perfis que o modelo sinalizou como "positivos", quantos eram de fato.
     - **Recall:** De todos os perfis "positivos" que existem, quantos o modelo conseguiu encontrar.
     """)
+    st.caption(f"Modelo treinado em {meta_modelo['criado_em']} com scikit-learn {meta_modelo['sklearn']}.")
+    selecao = meta_modelo.get('selecao')
+    if selecao:
+        # Publicado por `python -m selecao`: comparação dos candidatos na validação cruzada
+        st.subheader("Seleção de Modelo")
+        st.write(f"Modelo escolhido: **{selecao['candidato']}** `{selecao['params']}`, pela métrica "
+                 f"`{selecao['metrica']}` em validação cruzada com {selecao['n_folds']} folds.")
+        st.dataframe(
+            pd.DataFrame(selecao['candidatos']).rename(columns={
+                'estimador': 'Estimador', 'params': 'Parâmetros', 'acuracia': 'Acurácia', 'precisao': 'Precisão',
+                'recall': 'Recall', 'roc_auc': 'ROC AUC', 'tempo_ajuste_s': 'Ajuste (s)',
+                'tempo_predicao_ms': 'Previsão de 1 perfil (ms)', 'tempo_por_perfil_us': 'Por perfil em lote (µs)',
+            }).drop(columns=[c for c in selecao['candidatos'][0] if c.endswith('_desvio')]),
+            hide_index=True, use_container_width=True,
+            column_config={c: st.column_config.NumberColumn(format="%.3f")
+                           for c in ['Acurácia', 'Precisão', 'Recall', 'ROC AUC', 'Ajuste (s)',
+                                     'Previsão de 1 perfil (ms)', 'Por perfil em lote (µs)']}
+        )
+
+    estatisticas_cache = prediction_cache().estatisticas()
+    st.caption(f"Cache de previsões: {estatisticas_cache['entradas']} perfis "
+               f"({estatisticas_cache['bytes'] / 1024:.0f} KB), taxa de acerto de {estatisticas_cache['taxa_acerto']:.0%}.")
+
+    # Avaliação calculada uma vez no treino e guardada no registro: o expander não usa o estimador
+    avaliacao = meta_modelo['avaliacao']
 
     st.subheader("Matriz de Confusão")
     st.write("A matriz de confusão nos ajuda a ver os acertos e erros do modelo em detalhes.")
-    
-    fig, ax = plt.subplots()
-    ConfusionMatrixDisplay.from_estimator(model, X_test, y_test, ax=ax, cmap='Blues', display_labels=['Perfil Negativo', 'Perfil Positivo'])
-    st.pyplot(fig)
\ No newline at end of file
+    rotulos_perfil = ['Perfil Negativo', 'Perfil Positivo']
+    fig_matriz = px.imshow(
+        avaliacao['matriz_confusao'], x=rotulos_perfil, y=rotulos_perfil, text_auto=True,
+        color_continuous_scale='Blues', labels={'x': 'Previsto', 'y': 'Real', 'color': 'Perfis'}
+    )
+    exibir_grafico('matriz', fig_matriz, use_container_width=True)
+
+    col_roc, col_pr = st.columns(2)
+    with col_roc:
+        fig_roc = px.area(
+            pd.DataFrame(avaliacao['roc']), x='fpr', y='tpr',
+            title=f"Curva ROC (AUC = {meta_modelo['metricas']['roc_auc']:.3f})",
+            labels={'fpr': 'Taxa de falsos positivos', 'tpr': 'Taxa de verdadeiros positivos'}
+        )
+        fig_roc.add_shape(type='line', line=dict(dash='dash', color='gray'), x0=0, x1=1, y0=0, y1=1)
+        exibir_grafico('roc', fig_roc, use_container_width=True)
+    with col_pr:
+        fig_pr = px.line(
+            pd.DataFrame(avaliacao['precisao_recall']), x='recall', y='precisao',
+            title=f"Precisão x Recall (precisão média = {meta_modelo['metricas']['precisao_media']:.3f})",
+            labels={'recall': 'Recall', 'precisao': 'Precisão'}
+        )
+        exibir_grafico('pr', fig_pr, use_container_width=True)
+
+    st.subheader("Importância das Características")
+    importancias = pd.Series(avaliacao['importancias']).sort_values()
+    fig_importancias = px.bar(
+        x=importancias.to_numpy(), y=importancias.index, orientation='h',
+        labels={'x': 'Importância relativa', 'y': 'Característica'}
+    )
+    fig_importancias.update_layout(xaxis_tickformat='.0%')
+    exibir_grafico('importancias', fig_importancias, use_container_width=True)
@@ -5,8 +5,10 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from graficos import exibir_grafico
 from utils import load_data
-from scipy import stats
+from agregacoes import tabela_contingencia, pivotar
+from estatisticas import COLUNAS_CATEGORICAS, associacoes_qui_quadrado, matriz_simetrica, resultado_par
 import numpy as np # Adicionado por garantia
 
 st.set_page_config(layout="wide")
@@ -14,30 +16,27 @@ st.title("📈 Comparações por Grupos")
 
 df = load_data()
 
-# Dicionário para traduzir todas as respostas possíveis para português
-mapa_traducao_geral = {
-    'Yes': 'Sim',
-    'No': 'Não',
-    'Maybe': 'Talvez',
-    "Don't know": 'Não Sei',
-    'Some of them': 'Algum deles'
-}
-
 # Dicionário central de cores para todo o aplicativo
 mapa_cores_geral = {
     'Sim': 'lightgreen',
     'Não': 'lightcoral',
     'Talvez': 'skyblue',
-    'Não Sei': 'khaki',
+    'Não sei': 'khaki',
     'Algum deles': 'khaki'
 }
 
+# Todas as abas usam o motor de contingência de agregacoes.py: contagens e proporções já traduzidas,
+# calculadas com um único bincount sobre os códigos categóricos e memoizadas por versão do dataset
+
+# Intervalos de confiança bootstrap (95%) das proporções, memoizados junto com a tabela
+N_BOOT = 2000
+SEMENTE = 42
+
 
-df['treatment_pt'] = df['treatment'].map(mapa_traducao_geral)
-df['family_history_pt'] = df['family_history'].map(mapa_traducao_geral)
-df['remote_work_pt'] = df['remote_work'].map(mapa_traducao_geral)
-df['seek_help_pt'] = df['seek_help'].map(mapa_traducao_geral)
-df['supervisor_pt'] = df['supervisor'].map(mapa_traducao_geral)
+def com_erros(tabela):
+    """Distâncias da proporção até os limites do intervalo, no formato de error_y do Plotly."""
+    return tabela.assign(erro_superior=tabela['ic_superior'] - tabela['proporcao'],
+                         erro_inferior=tabela['proporcao'] - tabela['ic_inferior'])
 
 
 aba = st.selectbox("Escolha uma análise:", [
@@ -48,188 +47,214 @@ aba = st.selectbox("Escolha uma análise:", [
     "Proporção de Tratamento por Gênero",
     "Percepções sobre Apoio no Trabalho",
     "Medo de Consequências por Gênero",
-    "Percepção de Apoio por Gênero (Radar)"
+    "Percepção de Apoio por Gênero (Radar)",
+    "Associações entre Variáveis (Qui-quadrado)"
 ])
 
 # --- Gráficos de Quantidade ---
 
 if aba == "Tratamento x Histórico Familiar":
-    # Usar as colunas traduzidas '_pt'
-    cross_tab = pd.crosstab(df['family_history_pt'], df['treatment_pt']).reset_index().melt(id_vars='family_history_pt')
+    cross_tab = tabela_contingencia(df, 'family_history', 'treatment')
     fig = px.bar(
         cross_tab,
-        x='family_history_pt',
-        y='value',
-        color='treatment_pt',
+        x='family_history',
+        y='contagem',
+        color='treatment',
         title="Tratamento x Histórico Familiar",
-        labels={'family_history_pt': 'Histórico Familiar', 'value': 'Quantidade', 'treatment_pt': 'Fez Tratamento?'},
+        labels={'family_history': 'Histórico Familiar', 'contagem': 'Quantidade', 'treatment': 'Fez Tratamento?'},
         color_discrete_map=mapa_cores_geral # Aplicar mapa de cores
     )
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(aba, fig, use_container_width=True)
 
 # --- TODAS AS OUTRAS ABAS CONTINUAM IGUAIS E USANDO O 'gender_group' ORIGINAL ---
 
 elif aba == "Ambiente de Trabalho x Tratamento":
-    cross_tab = pd.crosstab(df['remote_work_pt'], df['treatment_pt']).reset_index().melt(id_vars='remote_work_pt')
+    cross_tab = tabela_contingencia(df, 'remote_work', 'treatment')
     fig = px.bar(
         cross_tab,
-        x='remote_work_pt',
-        y='value',
-        color='treatment_pt',
+        x='remote_work',
+        y='contagem',
+        color='treatment',
         title="Trabalho Remoto x Tratamento",
-        labels={'remote_work_pt': 'Trabalha Remoto?', 'value': 'Quantidade', 'treatment_pt': 'Fez Tratamento?'},
+        labels={'remote_work': 'Trabalha Remoto?', 'contagem': 'Quantidade', 'treatment': 'Fez Tratamento?'},
         color_discrete_map=mapa_cores_geral # Aplicar mapa de cores
     )
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(aba, fig, use_container_width=True)
 
 elif aba == "Faixa Etária x Tratamento":
-    df_idade = df[(df['age'] >= 15) & (df['age'] <= 80)].copy()
-    bins = [15, 24, 34, 44, 54, 64, 80]
-    labels = ['15-24', '25-34', '35-44', '45-54', '55-64', '65-80']
-    df_idade['faixa_etaria'] = pd.cut(df_idade['age'], bins=bins, labels=labels)
-    cross_tab = pd.crosstab(df_idade['faixa_etaria'], df_idade['treatment_pt']).reset_index().melt(id_vars='faixa_etaria')
+    # 'faixa_etaria' é derivada da idade (15-80) dentro do motor de contingência
+    cross_tab = tabela_contingencia(df, 'faixa_etaria', 'treatment')
     fig = px.bar(
         cross_tab,
         x='faixa_etaria',
-        y='value',
-        color='treatment_pt',
+        y='contagem',
+        color='treatment',
         title="Faixa Etária x Tratamento",
-        labels={'faixa_etaria': 'Faixa Etária', 'value': 'Quantidade', 'treatment_pt': 'Fez Tratamento?'},
+        labels={'faixa_etaria': 'Faixa Etária', 'contagem': 'Quantidade', 'treatment': 'Fez Tratamento?'},
         color_discrete_map=mapa_cores_geral # Aplicar mapa de cores
     )
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(aba, fig, use_container_width=True)
 
 elif aba == "Gênero x Tratamento":
-    cross_tab = pd.crosstab(df['gender_group'], df['treatment_pt']).reset_index().melt(id_vars='gender_group')
+    cross_tab = tabela_contingencia(df, 'gender_group', 'treatment')
     fig = px.bar(
         cross_tab,
         x='gender_group',
-        y='value',
-        color='treatment_pt',
+        y='contagem',
+        color='treatment',
         title="Gênero x Tratamento",
-        labels={'gender_group': 'Gênero', 'value': 'Quantidade', 'treatment_pt': 'Fez Tratamento?'},
+        labels={'gender_group': 'Gênero', 'contagem': 'Quantidade', 'treatment': 'Fez Tratamento?'},
         color_discrete_map=mapa_cores_geral
     )
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(aba, fig, use_container_width=True)
 
 elif aba == "Proporção de Tratamento por Gênero":
-    prop_treat = (
-        df.groupby('gender_group')['treatment_pt']
-        .value_counts(normalize=True)
-        .rename('proporcao')
-        .reset_index()
-    )
+    prop_treat = com_erros(tabela_contingencia(df, 'gender_group', 'treatment', normalizar='linha', n_boot=N_BOOT, seed=SEMENTE))
     fig = px.bar(
-        prop_treat, x='gender_group', y='proporcao', color='treatment_pt',
+        prop_treat, x='gender_group', y='proporcao', color='treatment', barmode='group',
+        error_y='erro_superior', error_y_minus='erro_inferior',
         title='Percentual de Tratamento por Gênero',
-        labels={'gender_group': 'Gênero', 'proporcao': 'Percentual (%)', 'treatment_pt': 'Fez Tratamento?'},
-        text=prop_treat['proporcao'].apply(lambda x: f'{x*100:.1f}%'),
+        labels={'gender_group': 'Gênero', 'proporcao': 'Percentual (%)', 'treatment': 'Fez Tratamento?'},
+        text_auto='.1%',
         color_discrete_map=mapa_cores_geral
     )
-    fig.update_layout(barmode='stack', yaxis_tickformat='.0%', height=500)
-    st.plotly_chart(fig, use_container_width=True)
+    fig.update_layout(yaxis_tickformat='.0%', height=500)
+    exibir_grafico(aba, fig, use_container_width=True)
+    st.caption("As barras de erro mostram o intervalo de confiança de 95% (bootstrap) de cada percentual.")
 
 elif aba == "Percepções sobre Apoio no Trabalho":
     st.markdown("### Proporção de pessoas que podem buscar ajuda")
-    grupo_ajuda = df.groupby(['gender_group', 'seek_help_pt']).size().reset_index(name='count')
-    grupo_ajuda['proporcao'] = grupo_ajuda.groupby('gender_group')['count'].transform(lambda x: x / x.sum())
+    grupo_ajuda = com_erros(tabela_contingencia(df, 'gender_group', 'seek_help', normalizar='linha', n_boot=N_BOOT, seed=SEMENTE))
     fig1 = px.bar(
-        grupo_ajuda, x='gender_group', y='proporcao', color='seek_help_pt',
-        barmode='group', title='Proporção de pessoas que podem buscar ajuda, por grupo de gênero',
-        labels={'proporcao': 'Proporção', 'gender_group': 'Gênero', 'seek_help_pt': 'Busca Ajuda?'},
+        grupo_ajuda, x='gender_group', y='proporcao', color='seek_help',
+        barmode='group', error_y='erro_superior', error_y_minus='erro_inferior',
+        title='Proporção de pessoas que podem buscar ajuda, por grupo de gênero',
+        labels={'proporcao': 'Proporção', 'gender_group': 'Gênero', 'seek_help': 'Busca Ajuda?'},
         color_discrete_map=mapa_cores_geral
     )
     fig1.update_layout(yaxis_tickformat='.0%')
-    st.plotly_chart(fig1, use_container_width=True)
+    exibir_grafico('apoio: busca de ajuda', fig1, use_container_width=True)
     st.markdown("---")
     st.markdown("### Disposição para Falar com Supervisor sobre Saúde Mental")
-    grupo_supervisor = df.groupby(['gender_group', 'supervisor_pt']).size().reset_index(name='count')
-    grupo_supervisor['proporcao'] = grupo_supervisor.groupby('gender_group')['count'].transform(lambda x: x / x.sum())
+    grupo_supervisor = com_erros(tabela_contingencia(df, 'gender_group', 'supervisor', normalizar='linha', n_boot=N_BOOT, seed=SEMENTE))
     fig2 = px.bar(
-        grupo_supervisor, x='gender_group', y='proporcao', color='supervisor_pt',
-        barmode='group', title='Disposição para Falar com Supervisor, por Gênero',
-        labels={'proporcao': 'Proporção de Respostas', 'gender_group': 'Gênero', 'supervisor_pt': 'Disposição'},
+        grupo_supervisor, x='gender_group', y='proporcao', color='supervisor',
+        barmode='group', error_y='erro_superior', error_y_minus='erro_inferior',
+        title='Disposição para Falar com Supervisor, por Gênero',
+        labels={'proporcao': 'Proporção de Respostas', 'gender_group': 'Gênero', 'supervisor': 'Disposição'},
         color_discrete_map=mapa_cores_geral
     )
     fig2.update_layout(yaxis_tickformat='.0%')
-    st.plotly_chart(fig2, use_container_width=True)
+    exibir_grafico('apoio: supervisor', fig2, use_container_width=True)
+    st.caption("As barras de erro mostram o intervalo de confiança de 95% (bootstrap) de cada proporção.")
 
 elif aba == "Medo de Consequências por Gênero":
     st.markdown("### Análise: Medo de Consequências no Trabalho por Gênero")
-    df['mental_health_consequence_pt'] = df['mental_health_consequence'].map(mapa_traducao_geral)
+    prop_df = com_erros(tabela_contingencia(df, 'gender_group', 'mental_health_consequence', normalizar='linha', n_boot=N_BOOT, seed=SEMENTE))
     with st.expander("Ver análise estatística (Teste Qui-quadrado)"):
-        contingency_mhc = pd.crosstab(df['gender_group'], df['mental_health_consequence_pt'])
+        contingency_mhc = pivotar(prop_df, 'contagem')
         st.write("**Tabela de Contingência (Contagem)**")
         st.dataframe(contingency_mhc)
-        try:
-            chi2, p, dof, ex = stats.chi2_contingency(contingency_mhc)
+        # Resultado lido da tabela de associações calculada em lote para todos os pares
+        teste = resultado_par(associacoes_qui_quadrado(df), 'gender_group', 'mental_health_consequence')
+        if pd.notna(teste['p']):
             st.write("**Resultado do Teste Qui-quadrado:**")
-            st.markdown(f"* **Estatística Qui-quadrado (χ²):** `{chi2:.3f}`\n* **p-valor:** `{p:.4f}`")
-            if p < 0.05: st.success("**Conclusão:** Existe uma associação estatisticamente significativa.")
+            st.markdown(f"* **Estatística Qui-quadrado (χ²):** `{teste['chi2']:.3f}`\n* **p-valor:** `{teste['p']:.4f}`"
+                        f"\n* **p-valor ajustado (Benjamini-Hochberg, todos os pares):** `{teste['p_ajustado']:.4f}`")
+            if teste['p'] < 0.05: st.success("**Conclusão:** Existe uma associação estatisticamente significativa.")
             else: st.warning("**Conclusão:** Não há evidências de associação estatisticamente significativa.")
-        except ValueError as e: st.error(f"Não foi possível realizar o teste Qui-quadrado. Erro: {e}")
-    prop_df = df.groupby('gender_group')['mental_health_consequence_pt'].value_counts(normalize=True).rename('proporcao').reset_index()
+        else: st.error("Não foi possível realizar o teste Qui-quadrado: a tabela tem uma única linha ou coluna.")
     st.markdown("---")
     st.subheader("Gráfico de Proporção")
     fig = px.bar(
-        prop_df, x='gender_group', y='proporcao', color='mental_health_consequence_pt',
-        barmode='group', title='Proporção do Medo de Consequências no Trabalho por Gênero',
-        labels={"gender_group": "Gênero", "proporcao": "Proporção", "mental_health_consequence_pt": "Haverá consequências?"},
+        prop_df, x='gender_group', y='proporcao', color='mental_health_consequence',
+        barmode='group', error_y='erro_superior', error_y_minus='erro_inferior',
+        title='Proporção do Medo de Consequências no Trabalho por Gênero',
+        labels={"gender_group": "Gênero", "proporcao": "Proporção", "mental_health_consequence": "Haverá consequências?"},
         text_auto='.2%', color_discrete_map=mapa_cores_geral
     )
     fig.update_yaxes(tickformat=".0%")
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(aba, fig, use_container_width=True)
+    st.caption("As barras de erro mostram o intervalo de confiança de 95% (bootstrap) de cada proporção.")
 
 # --- NOVO BLOCO ELIF PARA O GRÁFICO DE RADAR COM LÓGICA ISOLADA ---
 elif aba == "Percepção de Apoio por Gênero (Radar)":
     st.header("Comparativo: Percepção de Apoio à Saúde Mental por Gênero")
-    
-    # Lógica de classificação de gênero EXCLUSIVA para este gráfico
-    male_terms = ['male', 'm', 'man', 'cis male', 'cis man', 'male (cis)', 'make', 'mail', 'malr', 'msle', 'maile', 'cis male']
-    female_terms = ['female', 'f', 'woman', 'cis female', 'cis-female/femme', 'femake', 'cis woman', 'femail']
-    trans_nb_terms = ['trans-female', 'trans woman', 'male to female', 'transfemale', 'non-binary', 'agender', 'androgyne', 'genderqueer', 'gender fluid', 'nonbinary']
-
-    def classify_gender_radar(g):
-        g = str(g).strip().lower()
-        if g in male_terms: return 'Homem'
-        elif g in female_terms: return 'Mulher'
-        elif g in trans_nb_terms: return 'Trans/NB'
-        else: return 'Outro'
-
-    # Criar uma cópia do DataFrame para não afetar as outras abas
-    df_radar = df.copy()
-    # Criar a nova coluna de gênero agrupado apenas neste DataFrame temporário
-    df_radar['gender_group_radar'] = df_radar['gender'].apply(classify_gender_radar)
-
-    # Preparação dos dados para o gráfico
+
+    # Preparação dos dados para o gráfico: proporção de 'Yes' de cada opção de apoio por gênero,
+    # com o esquema de gênero do radar (Homem / Mulher / Trans/NB / Outro)
     colunas_map_radar = {
         'benefits': 'Acesso a benefícios',
         'care_options': 'Opções de cuidado',
         'seek_help': 'Pode buscar ajuda',
         'anonymity': 'Anonimato garantido'
     }
-    dados_para_grafico = []
     grupos_para_analise = ['Homem', 'Mulher', 'Trans/NB']
 
-    for grupo in grupos_para_analise:
-        grupo_df = df_radar[df_radar['gender_group_radar'] == grupo]
-        for col_original, col_pt in colunas_map_radar.items():
-            prop = grupo_df[col_original].value_counts(normalize=True).get('Yes', 0)
-            dados_para_grafico.append({
-                'Gênero': grupo, 'Opção de Apoio': col_pt, 'Proporção': prop
-            })
-    
-    df_plot_radar = pd.DataFrame(dados_para_grafico)
+    partes = []
+    for col_original, col_pt in colunas_map_radar.items():
+        tabela = tabela_contingencia(df, 'gender_group_classified', col_original, normalizar='linha',
+                                     idioma='en', n_boot=N_BOOT, seed=SEMENTE)
+        sim = (tabela[tabela[col_original] == 'Yes'].set_index('gender_group_classified')
+               [['proporcao', 'ic_inferior', 'ic_superior']].reindex(grupos_para_analise, fill_value=0))
+        partes.append(pd.DataFrame({
+            'Gênero': grupos_para_analise,
+            'Opção de Apoio': col_pt,
+            'Proporção': sim['proporcao'].to_numpy(),
+            'IC 95% (inferior)': sim['ic_inferior'].to_numpy(),
+            'IC 95% (superior)': sim['ic_superior'].to_numpy()
+        }))
+
+    df_plot_radar = pd.concat(partes, ignore_index=True)
 
     # Geração do Gráfico de Radar
     if not df_plot_radar.empty:
         fig_radar = px.line_polar(
             df_plot_radar, r='Proporção', theta='Opção de Apoio', color='Gênero',
-            line_close=True, title="Percepção de Apoio à Saúde Mental (% de respostas 'Sim')",
+            line_close=True, hover_data={'IC 95% (inferior)': ':.1%', 'IC 95% (superior)': ':.1%'},
+            title="Percepção de Apoio à Saúde Mental (% de respostas 'Sim')",
             template="seaborn", range_r=[0, 1]
         )
         fig_radar.update_traces(fill='toself')
         fig_radar.update_layout(polar=dict(radialaxis=dict(visible=True, tickformat=".0%")))
-        st.plotly_chart(fig_radar, use_container_width=True)
+        exibir_grafico('radar', fig_radar, use_container_width=True)
+        with st.expander("Ver intervalos de confiança (bootstrap, 95%)"):
+            st.dataframe(df_plot_radar, hide_index=True, use_container_width=True, column_config={
+                c: st.column_config.NumberColumn(format="%.3f")
+                for c in ['Proporção', 'IC 95% (inferior)', 'IC 95% (superior)']
+            })
     else:
-        st.warning("Não há dados suficientes para gerar o gráfico de radar.")
\ No newline at end of file
+        st.warning("Não há dados suficientes para gerar o gráfico de radar.")
+
+elif aba == "Associações entre Variáveis (Qui-quadrado)":
+    st.header("Associação entre todas as variáveis da pesquisa")
+    st.markdown("""
+    Teste Qui-quadrado para **todos os pares** de variáveis categóricas, calculado em lote. O **V de Cramér**
+    mede a força da associação (0 = nenhuma, 1 = total) e o **p-valor ajustado** corrige o p-valor para
+    comparações múltiplas (Benjamini-Hochberg), já que centenas de pares são testados ao mesmo tempo.
+    """)
+    associacoes = associacoes_qui_quadrado(df)
+
+    fig_assoc = px.imshow(
+        matriz_simetrica(associacoes, 'cramer_v', COLUNAS_CATEGORICAS),
+        color_continuous_scale='Blues', zmin=0, aspect='auto',
+        title="V de Cramér entre pares de variáveis", labels={'color': 'V de Cramér'}
+    )
+    fig_assoc.update_layout(height=800)
+    exibir_grafico('assoc', fig_assoc, use_container_width=True)
+
+    apenas_significativos = st.checkbox("Mostrar apenas pares significativos (p-valor ajustado < 0,05)", value=True)
+    tabela_exibida = associacoes[associacoes['p_ajustado'] < 0.05] if apenas_significativos else associacoes
+    st.dataframe(
+        tabela_exibida.rename(columns={
+            'variavel_a': 'Variável A', 'variavel_b': 'Variável B', 'chi2': 'χ²', 'gl': 'Graus de liberdade',
+            'p': 'p-valor', 'p_ajustado': 'p-valor ajustado', 'cramer_v': 'V de Cramér', 'n': 'Respostas'
+        }),
+        hide_index=True, use_container_width=True,
+        column_config={
+            'χ²': st.column_config.NumberColumn(format="%.2f"),
+            'p-valor': st.column_config.NumberColumn(format="%.4f"),
+            'p-valor ajustado': st.column_config.NumberColumn(format="%.4f"),
+            'V de Cramér': st.column_config.NumberColumn(format="%.3f"),
+        }
+    )
@@ -4,27 +4,40 @@
 
 import streamlit as st
 import plotly.express as px
+from graficos import exibir_grafico
 from utils import load_data
+from estatisticas import COLUNAS_CATEGORICAS, METRICAS_ASSOCIACAO, matriz_associacao
 
 st.title("🔁 Correlações entre Fatores")
 
 df = load_data()
 cols_corr = ['treatment', 'benefits', 'care_options', 'seek_help', 'anonymity', 'family_history', 'remote_work']
-df_corr = df[cols_corr].copy()
 
-for col in cols_corr:
-    df_corr[col] = df_corr[col].map({'Yes': 1, 'No': 0})
+# Associação calculada com todas as categorias de cada coluna ('Talvez', 'Não sei', ...), sem descartar
+# respondentes: cada par usa todas as linhas em que as duas perguntas foram respondidas
+colunas = st.multiselect("Variáveis:", options=COLUNAS_CATEGORICAS, default=cols_corr)
+metrica = st.radio("Medida de associação:", options=list(METRICAS_ASSOCIACAO),
+                   format_func=METRICAS_ASSOCIACAO.get, horizontal=True)
 
-df_corr = df_corr.dropna()
-corr_matrix = df_corr.corr()
+if len(colunas) < 2:
+    st.info("Selecione pelo menos duas variáveis.")
+else:
+    corr_matrix = matriz_associacao(df, tuple(colunas), metrica)
 
-fig_heatmap = px.imshow(
-    corr_matrix,
-    text_auto=True,
-    aspect="auto",
-    color_continuous_scale='RdBu',
-    title='Matriz de Correlação'
-)
-st.plotly_chart(fig_heatmap)
+    fig_heatmap = px.imshow(
+        corr_matrix,
+        text_auto='.2f',
+        aspect="auto",
+        color_continuous_scale='Blues',
+        zmin=0, zmax=1,
+        title=f'Matriz de Associação ({METRICAS_ASSOCIACAO[metrica]})'
+    )
+    exibir_grafico('heatmap', fig_heatmap)
 
-st.write("As correlações mais significativas envolvem histórico familiar e acesso a cuidados.")
\ No newline at end of file
+    if metrica == 'theil_u':
+        st.caption("U de Theil não é simétrico: cada célula mostra quanto conhecer a variável da coluna "
+                   "reduz a incerteza sobre a variável da linha (0 = nada, 1 = totalmente).")
+    else:
+        st.caption("V de Cramér: força da associação entre as duas variáveis (0 = nenhuma, 1 = total).")
+
+st.write("As correlações mais significativas envolvem histórico familiar e acesso a cuidados.")
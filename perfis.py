@@ -0,0 +1,414 @@
+"""
+Motor de clustering da página de Perfis (Clustering).
+
+Os dados são pré-processados uma única vez (idade padronizada + one-hot das categóricas) e o K-Means
+é ajustado para todos os valores de k do slider, em paralelo entre os núcleos. Rótulos, centroides,
+inércia e silhueta de cada solução ficam em cache por versão do dataset: mover o slider é só uma
+consulta, e as curvas de cotovelo e silhueta saem das mesmas soluções. O perfil de cada cluster
+(médias, taxas de 'Yes', distribuição das categorias e lift) também é calculado junto com cada
+solução, com produtos esparsos entre a matriz de pertinência e a matriz indicadora.
+
+Para tabelas grandes demais para a memória há um segundo backend, o 'mini_lote': os respondentes
+são lidos em blocos do snapshot em disco, codificados como matrizes esparsas e usados em
+MiniBatchKMeans.partial_fit para todos os k na mesma leitura; em seguida, algumas iterações de
+Lloyd em streaming (somas por cluster acumuladas bloco a bloco com produtos esparsos) refinam os
+centroides. A memória depende do tamanho do bloco, e não do número de linhas (além de um rótulo
+int8 por linha e k). O backend mede a vazão (e, fora do app, o pico de memória), e
+`python -m perfis comparar` confere se ele reproduz o K-Means exato no dataset atual.
+
+Com respostas anexadas ao dataset (ver ingestao.py), o clustering continua sendo o da versão de
+referência da política de retreino, e só é refeito quando ela pede.
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn import config_context
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.compose import ColumnTransformer
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+import ingestao
+import utils
+from estatisticas import matriz_indicadora
+from instrumentacao import instrumentar
+from utils import cache_por_versao
+
+FEATURES_CLUSTER = [
+    'age', 'gender_group', 'family_history', 'benefits', 'care_options',
+    'anonymity', 'leave', 'work_interfere', 'remote_work', 'tech_company'
+]
+VALORES_K = range(2, 9)
+# Acima disso a silhueta é estimada em uma amostra (o custo exato é quadrático no número de linhas)
+AMOSTRA_SILHUETA = 10_000
+
+BACKENDS = {
+    'exato': "K-Means exato (em memória)",
+    'mini_lote': "MiniBatch K-Means (blocos do disco)",
+}
+TAMANHO_BLOCO = 100_000
+TAMANHO_LOTE = 1024
+EPOCAS = 3
+REFINAMENTOS = 10
+# Memória de trabalho (MB) das distâncias da silhueta, calculadas em pedaços desse tamanho
+MEMORIA_SILHUETA = 64
+# Diferença relativa de inércia (em módulo) aceita entre o mini-lote e o K-Means exato
+TOLERANCIA_INERCIA = 0.05
+# Concordância mínima entre os rótulos dos dois backends (índice de Rand ajustado)
+MIN_RAND_AJUSTADO = 0.8
+
+
+def preparar_dados(df):
+    """Respondentes com todas as features preenchidas e idade entre 15 e 80 anos."""
+    df_cluster = df[FEATURES_CLUSTER].copy().dropna()
+    return df_cluster[(df_cluster['age'] >= 15) & (df_cluster['age'] <= 80)]
+
+
+def construir_preprocessador(df_cluster):
+    numerical_features = df_cluster.select_dtypes(include=np.number).columns.tolist()
+    categorical_features = df_cluster.select_dtypes(include=['object', 'category']).columns.tolist()
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numerical_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+        ])
+
+
+def ajustar_kmeans(X, k):
+    """Uma solução do K-Means: rótulos, centroides, inércia e silhueta."""
+    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10).fit(X)
+    amostra = AMOSTRA_SILHUETA if X.shape[0] > AMOSTRA_SILHUETA else None
+    return {
+        'k': k,
+        'rotulos': kmeans.labels_.astype(np.int8),
+        'centroides': kmeans.cluster_centers_,
+        'inercia': float(kmeans.inertia_),
+        'silhueta': float(silhouette_score(X, kmeans.labels_, sample_size=amostra, random_state=42)),
+    }
+
+
+@instrumentar
+def ajustar_todos(X, valores_k=VALORES_K, n_jobs=-1):
+    """Soluções para todos os k, ajustadas em paralelo; devolve {k: solução}."""
+    solucoes = Parallel(n_jobs=n_jobs)(delayed(ajustar_kmeans)(X, k) for k in valores_k)
+    return {solucao['k']: solucao for solucao in solucoes}
+
+
+def diagnostico(solucoes):
+    """Inércia (cotovelo) e silhueta de cada k."""
+    return pd.DataFrame([{'k': k, 'inercia': s['inercia'], 'silhueta': s['silhueta']}
+                         for k, s in sorted(solucoes.items())])
+
+
+# Em st.cache_resource: as soluções (com um rótulo por respondente para cada k) são compartilhadas
+# sem serializar a cada rerun do slider; quem as recebe não deve alterá-las
+@cache_por_versao(recurso=True, max_entries=2)
+def solucoes_kmeans(df):
+    """
+    Nomes das features codificadas e as soluções do K-Means (com o perfil de cada cluster) para
+    todos os k do slider, calculados uma vez por versão do dataset.
+    """
+    df_cluster = preparar_dados(df)
+    preprocessor = construir_preprocessador(df_cluster)
+    X = preprocessor.fit_transform(df_cluster)
+    return {
+        'features': preprocessor.get_feature_names_out().tolist(),
+        'solucoes': com_perfis(df_cluster, ajustar_todos(X)),
+    }
+
+
+# --- Perfil dos clusters ---
+
+COLUNAS_SIM = ['family_history', 'benefits', 'care_options', 'anonymity', 'remote_work', 'tech_company']
+
+
+def perfilar(df_cluster, rotulos):
+    """
+    Estatísticas de todos os clusters para todas as features de uma vez: tamanho, média da idade,
+    distribuição de cada categoria no cluster, proporção na população geral e lift (razão entre as
+    duas), além das taxas de 'Yes' por variável. Os contadores saem de um único produto esparso
+    entre a matriz de pertinência (clusters x respondentes) e a matriz indicadora das categorias.
+    """
+    rotulos = np.asarray(rotulos, dtype=np.int64)
+    n, k = len(rotulos), int(rotulos.max()) + 1
+    tamanhos = np.bincount(rotulos, minlength=k)
+    pertinencia = sparse.csr_matrix((np.ones(n), (rotulos, np.arange(n))), shape=(k, n))
+
+    X, _, categorias = matriz_indicadora(df_cluster, FEATURES_CLUSTER[1:])
+    contagens = (pertinencia @ X).toarray()
+    proporcao = contagens / np.maximum(tamanhos, 1)[:, None]
+    geral = np.asarray(X.sum(axis=0)).ravel() / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = proporcao / geral
+
+    distribuicao = pd.DataFrame({
+        'cluster': np.repeat(np.arange(k), len(categorias)),
+        'variavel': np.tile([coluna for coluna, _ in categorias], k),
+        'categoria': np.tile([str(c) for _, c in categorias], k),
+        'contagem': contagens.ravel().astype(int),
+        'proporcao': proporcao.ravel(),
+        'geral': np.tile(geral, k),
+        'lift': lift.ravel(),
+    })
+    # Categorias que nenhum respondente escolheu não têm lift definido
+    distribuicao = distribuicao[distribuicao['geral'] > 0].reset_index(drop=True)
+
+    sim = distribuicao[distribuicao['categoria'] == 'Yes']
+    return {
+        'tamanhos': tamanhos,
+        'medias': pd.DataFrame({'age': np.bincount(rotulos, weights=df_cluster['age'].to_numpy(dtype=np.float64),
+                                                   minlength=k) / np.maximum(tamanhos, 1)}),
+        'distribuicao': distribuicao,
+        'taxas_sim': sim.pivot(index='cluster', columns='variavel', values='proporcao').reindex(range(k)),
+    }
+
+
+def com_perfis(df_cluster, solucoes):
+    """Acrescenta o perfil (ver perfilar) a cada solução, para ficar em cache junto com ela."""
+    for solucao in solucoes.values():
+        solucao['perfil'] = perfilar(df_cluster, solucao['rotulos'])
+    return solucoes
+
+
+# --- Backend em mini-lotes (streaming) ---
+
+def ler_blocos(fonte, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Blocos (DataFrames) com as features do clustering, já filtrados como em preparar_dados. A fonte é
+    um arquivo Arrow/Feather ou Parquet (ou uma lista deles, como o snapshot com os segmentos
+    anexados) lido aos poucos, ou um DataFrame já em memória.
+    """
+    if isinstance(fonte, pd.DataFrame):
+        blocos = (fonte.iloc[inicio:inicio + tamanho_bloco][FEATURES_CLUSTER]
+                  for inicio in range(0, len(fonte), tamanho_bloco))
+    else:
+        arquivos = [str(arquivo) for arquivo in fonte] if isinstance(fonte, (list, tuple)) else str(fonte)
+        primeiro = arquivos[0] if isinstance(arquivos, list) else arquivos
+        formato = 'parquet' if Path(primeiro).suffix.lower() in ('.parquet', '.pq') else 'feather'
+        lotes = ds.dataset(arquivos, format=formato).to_batches(columns=FEATURES_CLUSTER, batch_size=tamanho_bloco)
+        blocos = (lote.to_pandas() for lote in lotes)
+    for bloco in blocos:
+        yield preparar_dados(bloco)
+
+
+class CodificadorEsparso:
+    """
+    Equivalente em streaming do preprocessador (idade padronizada + one-hot), com saída esparsa.
+    `observar` acumula médias e categorias bloco a bloco; depois de `finalizar`, `transformar`
+    codifica cada bloco com as mesmas colunas, na mesma ordem, do ColumnTransformer.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.soma = self.soma_quadrados = 0.0
+        self.valores = {coluna: set() for coluna in FEATURES_CLUSTER[1:]}
+
+    def observar(self, bloco):
+        idade = bloco['age'].to_numpy(dtype=np.float64)
+        self.n += len(idade)
+        self.soma += idade.sum()
+        self.soma_quadrados += (idade ** 2).sum()
+        for coluna, valores in self.valores.items():
+            valores.update(bloco[coluna].unique().tolist())
+
+    def finalizar(self):
+        self.media = self.soma / self.n
+        desvio = np.sqrt(max(self.soma_quadrados / self.n - self.media ** 2, 0.0))
+        self.desvio = desvio if desvio > 0 else 1.0
+        # Categorias em ordem alfabética, como o OneHotEncoder
+        self.categorias = {coluna: sorted(valores) for coluna, valores in self.valores.items()}
+        self.posicoes, posicao = {}, 1
+        for coluna, categorias in self.categorias.items():
+            self.posicoes[coluna] = {c: posicao + k for k, c in enumerate(categorias)}
+            posicao += len(categorias)
+        self.n_features = posicao
+        self.nomes = ['num__age'] + [f"cat__{coluna}_{c}" for coluna, cats in self.categorias.items() for c in cats]
+        return self
+
+    def transformar(self, bloco):
+        n = len(bloco)
+        colunas = [np.zeros(n, dtype=np.int64)]
+        for coluna, posicoes in self.posicoes.items():
+            serie = bloco[coluna].astype('category')
+            # Posição global de cada categoria do bloco, indexada pelos códigos (sem laço por linha).
+            # Categorias do tipo sem nenhuma resposta observada (ex.: 'Trans' em um recorte) viram -1
+            mapa = np.array([posicoes.get(c, -1) for c in serie.cat.categories], dtype=np.int64)
+            colunas.append(mapa[serie.cat.codes.to_numpy()])
+        indices = np.column_stack(colunas)
+        dados = np.ones(indices.shape)
+        dados[:, 0] = (bloco['age'].to_numpy(dtype=np.float64) - self.media) / self.desvio
+        # Valores desconhecidos ficam sem coluna, como no OneHotEncoder(handle_unknown='ignore')
+        validos = indices >= 0
+        linhas = np.broadcast_to(np.arange(n)[:, None], indices.shape)
+        return sparse.csr_matrix((dados[validos], (linhas[validos], indices[validos])), shape=(n, self.n_features))
+
+
+def _refinar(fonte, tamanho_bloco, codificador, modelos):
+    # Uma iteração de Lloyd para todos os k: centroide = média dos pontos atribuídos a ele
+    somas = {k: np.zeros_like(kmeans.cluster_centers_) for k, kmeans in modelos.items()}
+    contagens = {k: np.zeros(k) for k in modelos}
+    for bloco in ler_blocos(fonte, tamanho_bloco):
+        X = codificador.transformar(bloco)
+        for k, kmeans in modelos.items():
+            rotulos = kmeans.predict(X)
+            pertinencia = sparse.csr_matrix((np.ones(len(rotulos)), (rotulos, np.arange(len(rotulos)))),
+                                            shape=(k, X.shape[0]))
+            somas[k] += (pertinencia @ X).toarray()
+            contagens[k] += np.bincount(rotulos, minlength=k)
+    for k, kmeans in modelos.items():
+        # Clusters que ficaram vazios mantêm o centroide anterior
+        ocupados = contagens[k] > 0
+        kmeans.cluster_centers_[ocupados] = somas[k][ocupados] / contagens[k][ocupados, None]
+
+
+@instrumentar
+def ajustar_mini_lote(fonte, valores_k=VALORES_K, tamanho_bloco=TAMANHO_BLOCO, tamanho_lote=TAMANHO_LOTE,
+                      epocas=EPOCAS, refinamentos=REFINAMENTOS, medir_memoria=False):
+    """
+    Soluções de MiniBatchKMeans para todos os k, lendo `fonte` em blocos (ver ler_blocos): uma
+    leitura para as estatísticas da codificação, `epocas` leituras de partial_fit, `refinamentos`
+    iterações de Lloyd em streaming e uma leitura final para rótulos, inércia e uma amostra para a
+    silhueta. Devolve as features, as soluções e o desempenho (linhas por segundo e, com
+    `medir_memoria`, o pico de memória alocada, medido com tracemalloc). O tracemalloc vale para o
+    processo inteiro e deixa as outras threads mais lentas: fica desligado no app.
+    """
+    # Um rastreamento já em andamento (ex.: o do benchmark) não é encerrado aqui
+    iniciou = medir_memoria and not tracemalloc.is_tracing()
+    if iniciou:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        codificador = CodificadorEsparso()
+        for bloco in ler_blocos(fonte, tamanho_bloco):
+            codificador.observar(bloco)
+        codificador.finalizar()
+
+        modelos = {k: MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=tamanho_lote, n_init=3)
+                   for k in valores_k}
+        for _ in range(epocas):
+            for bloco in ler_blocos(fonte, tamanho_bloco):
+                X = codificador.transformar(bloco)
+                for lote in range(0, X.shape[0], tamanho_lote):
+                    for kmeans in modelos.values():
+                        kmeans.partial_fit(X[lote:lote + tamanho_lote])
+        for _ in range(refinamentos):
+            _refinar(fonte, tamanho_bloco, codificador, modelos)
+
+        rng = np.random.default_rng(42)
+        fracao = min(1.0, AMOSTRA_SILHUETA / codificador.n)
+        rotulos = {k: [] for k in valores_k}
+        inercia = dict.fromkeys(valores_k, 0.0)
+        amostra, rotulos_amostra = [], {k: [] for k in valores_k}
+        for bloco in ler_blocos(fonte, tamanho_bloco):
+            X = codificador.transformar(bloco)
+            sorteados = rng.random(X.shape[0]) < fracao
+            amostra.append(X[sorteados])
+            for k, kmeans in modelos.items():
+                r = kmeans.predict(X).astype(np.int8)
+                rotulos[k].append(r)
+                rotulos_amostra[k].append(r[sorteados])
+                inercia[k] -= kmeans.score(X)
+        amostra = sparse.vstack(amostra)
+
+        solucoes = {}
+        for k, kmeans in modelos.items():
+            r = np.concatenate(rotulos_amostra[k])
+            with config_context(working_memory=MEMORIA_SILHUETA):
+                silhueta = float(silhouette_score(amostra, r)) if len(np.unique(r)) > 1 else float('nan')
+            solucoes[k] = {
+                'k': k,
+                'rotulos': np.concatenate(rotulos[k]),
+                'centroides': kmeans.cluster_centers_,
+                'inercia': float(inercia[k]),
+                'silhueta': silhueta,
+            }
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] / 2 ** 20 if medir_memoria else None
+    finally:
+        if iniciou:
+            tracemalloc.stop()
+
+    return {
+        'features': codificador.nomes,
+        'solucoes': solucoes,
+        'desempenho': {
+            'linhas': codificador.n, 'segundos': segundos,
+            # Cada época, cada refinamento e as leituras de estatísticas e de rótulos percorrem todas as linhas
+            'linhas_por_segundo': codificador.n * (epocas + refinamentos + 2) / segundos,
+            'pico_memoria_mb': pico,
+        },
+    }
+
+
+@cache_por_versao(recurso=True, max_entries=2)
+def solucoes_mini_lote(df):
+    """Como solucoes_kmeans, mas com o backend em mini-lotes lendo o snapshot do disco em blocos."""
+    # Sem snapshot gravado (ex.: disco somente leitura), os blocos vêm do DataFrame em memória
+    fonte = utils.arquivos_snapshot(df) or df
+    resultado = ajustar_mini_lote(fonte)
+    df_cluster = preparar_dados(df)
+    return {**resultado, 'solucoes': com_perfis(df_cluster, resultado['solucoes'])}
+
+
+def solucoes(df, backend='exato'):
+    """Soluções do clustering com o backend escolhido (ver BACKENDS), para a versão de referência do dataset."""
+    df = ingestao.recorte_modelagem(df)
+    return solucoes_mini_lote(df) if backend == 'mini_lote' else solucoes_kmeans(df)
+
+
+def comparar_backends(exato, mini_lote):
+    """
+    Concordância (índice de Rand ajustado) e diferença relativa de inércia entre os dois backends, por
+    k. O mini-lote só reproduz o K-Means exato quando os rótulos concordam (MIN_RAND_AJUSTADO) e a
+    inércia fica perto da exata, para mais ou para menos (TOLERANCIA_INERCIA).
+    """
+    linhas = []
+    for k, solucao in sorted(exato['solucoes'].items()):
+        aproximada = mini_lote['solucoes'][k]
+        diferenca = (aproximada['inercia'] - solucao['inercia']) / solucao['inercia']
+        rand = adjusted_rand_score(solucao['rotulos'], aproximada['rotulos'])
+        linhas.append({
+            'k': k, 'rand_ajustado': rand,
+            'inercia_exato': solucao['inercia'], 'inercia_mini_lote': aproximada['inercia'],
+            'diferenca_relativa': diferenca,
+            'dentro_tolerancia': rand >= MIN_RAND_AJUSTADO and abs(diferenca) <= TOLERANCIA_INERCIA,
+        })
+    return pd.DataFrame(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m perfis', description="Motor de clustering da página de Perfis.")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    cmd_comparar = comandos.add_parser('comparar', help="compara o backend em mini-lotes com o K-Means exato")
+    cmd_comparar.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    cmd_comparar.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO)
+    cmd_comparar.add_argument('--epocas', type=int, default=EPOCAS)
+    args = parser.parse_args(argv)
+
+    if args.comando == 'comparar':
+        df = utils.carregar_dataset(args.origem)
+        X = construir_preprocessador(preparar_dados(df)).fit_transform(preparar_dados(df))
+        inicio = time.perf_counter()
+        exato = {'solucoes': ajustar_todos(X)}
+        segundos_exato = time.perf_counter() - inicio
+        mini_lote = ajustar_mini_lote(utils.arquivos_snapshot(df, args.origem) or df, tamanho_bloco=args.tamanho_bloco,
+                                      epocas=args.epocas, medir_memoria=True)
+        comparacao = comparar_backends(exato, mini_lote)
+        print(comparacao.round(4).to_string(index=False))
+        desempenho = mini_lote['desempenho']
+        print(f"\n{comparacao['dentro_tolerancia'].sum()} de {len(comparacao)} valores de k dentro da tolerância "
+              f"(Rand ajustado >= {MIN_RAND_AJUSTADO}, |diferença de inércia| <= {TOLERANCIA_INERCIA:.0%})")
+        print(f"Exato: {segundos_exato:.1f}s. Mini-lote: {desempenho['linhas']} linhas em {desempenho['segundos']:.1f}s "
+              f"({desempenho['linhas_por_segundo']:,.0f} linhas/s), pico de memória {desempenho['pico_memoria_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
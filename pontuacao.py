@@ -0,0 +1,114 @@
+"""
+Pontuação em lote de perfis com o modelo de classificação do registro (ver modelo.py).
+
+Lê um CSV ou Parquet de perfis em blocos, converte os rótulos em português para os valores do
+dataset coluna a coluna (renomeando categorias, sem percorrer linha a linha), calcula a
+probabilidade de busca por tratamento de cada bloco e grava o resultado à medida que os blocos
+ficam prontos, de modo que a memória usada depende do tamanho do bloco e não do arquivo:
+
+    python -m pontuacao perfis.csv resultado.csv --n-jobs 4
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from joblib import Parallel, delayed, effective_n_jobs
+
+import modelo
+import traducao
+import utils
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 50_000
+COLUNA_PROBABILIDADE = 'probabilidade_tratamento'
+
+
+def ler_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """DataFrames sucessivos de até `tamanho_bloco` linhas de um CSV ou Parquet."""
+    if utils.eh_parquet(caminho):
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco)
+
+
+def preparar_perfis(perfis):
+    """
+    Colunas de entrada do modelo a partir de perfis com rótulos em português ou em inglês.
+    `work_interfere` vazio vira 'Não sabe', como no treino.
+    """
+    faltando = [c for c in modelo.FEATURES if c not in perfis.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes nos perfis: {', '.join(faltando)}")
+
+    X = pd.DataFrame({'age': pd.to_numeric(perfis['age'], errors='coerce')}, index=perfis.index)
+    for coluna in modelo.FEATURES[1:]:
+        X[coluna] = traducao.para_ingles(perfis[coluna])
+    X['work_interfere'] = X['work_interfere'].cat.add_categories(
+        [] if 'Não sabe' in X['work_interfere'].cat.categories else ['Não sabe']).fillna('Não sabe')
+    return X
+
+
+def pontuar(pipeline, perfis):
+    """Probabilidade de busca por tratamento de cada perfil, como uma Series alinhada a `perfis`."""
+    probabilidades = pipeline.predict_proba(preparar_perfis(perfis))[:, 1]
+    return pd.Series(probabilidades, index=perfis.index, name=COLUNA_PROBABILIDADE)
+
+
+def pontuar_em_partes(pipeline, perfis, n_jobs):
+    """Como pontuar, com o bloco dividido em partes avaliadas em paralelo (threads)."""
+    partes = [parte for parte in np.array_split(np.arange(len(perfis)), effective_n_jobs(n_jobs)) if len(parte)]
+    resultados = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(pontuar)(pipeline, perfis.iloc[parte]) for parte in partes)
+    return pd.concat(resultados) if resultados else pontuar(pipeline, perfis)
+
+
+def pontuar_arquivo(entrada, saida, pipeline=None, tamanho_bloco=TAMANHO_BLOCO, n_jobs=None):
+    """
+    Pontua todos os perfis de `entrada` e grava em `saida` as colunas originais mais a probabilidade.
+    Sem `pipeline`, usa o modelo do registro para o dataset atual. `n_jobs` paraleliza a avaliação
+    das árvores de cada bloco quando o classificador aceita `n_jobs` (ex.: RandomForest); nos demais
+    (ex.: GradientBoosting), cada bloco é dividido em partes pontuadas em paralelo. Devolve o número
+    de perfis pontuados.
+    """
+    if pipeline is None:
+        pipeline, _ = modelo.obter_modelo(utils.carregar_dataset())
+    em_partes = n_jobs is not None and 'n_jobs' not in pipeline.named_steps['classifier'].get_params()
+    if n_jobs is not None and not em_partes:
+        pipeline.set_params(classifier__n_jobs=n_jobs)
+
+    gravador = utils.GravadorBlocos(saida)
+    total = 0
+    try:
+        for bloco in ler_em_blocos(entrada, tamanho_bloco):
+            probabilidades = pontuar_em_partes(pipeline, bloco, n_jobs) if em_partes else pontuar(pipeline, bloco)
+            gravador.gravar(bloco.assign(**{COLUNA_PROBABILIDADE: probabilidades}))
+            total += len(bloco)
+            logger.info("%d perfis pontuados", total)
+    finally:
+        gravador.fechar()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pontuacao',
+                                     description="Pontua um CSV/Parquet de perfis com o modelo do registro.")
+    parser.add_argument('entrada', help="CSV ou Parquet com as colunas de entrada do modelo")
+    parser.add_argument('saida', help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO)
+    parser.add_argument('--n-jobs', type=int, default=None, help="threads para avaliar cada bloco (-1 = todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    total = pontuar_arquivo(args.entrada, args.saida, tamanho_bloco=args.tamanho_bloco, n_jobs=args.n_jobs)
+    duracao = time.perf_counter() - inicio
+    print(f"{total} perfis pontuados em {duracao:.1f}s ({total / max(duracao, 1e-9):,.0f} perfis/s)")
+
+
+if __name__ == '__main__':
+    main()
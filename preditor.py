@@ -0,0 +1,208 @@
+"""
+Caminho rápido de inferência para o formulário de Classificação.
+
+O Pipeline do scikit-learn gasta quase todo o tempo de uma previsão isolada em despacho do
+ColumnTransformer, no OneHotEncoder sobre um DataFrame de uma linha e na travessia das árvores via
+joblib. O PreditorRapido é montado uma vez a partir do Pipeline ajustado:
+
+- a posição one-hot de cada opção de cada coluna (rótulos em inglês e em português) é pré-calculada;
+- todas as árvores do modelo são concatenadas em vetores NumPy contíguos (filhos, feature, limiar
+  e valor das folhas), e um perfil percorre todas as árvores ao mesmo tempo, um nível por
+  iteração, só com indexação de arrays.
+
+Os três tipos de modelo da seleção (selecao.py) são suportados: random forest (média das
+probabilidades das folhas), gradient boosting (soma dos valores das folhas, já multiplicados pela
+taxa de aprendizado, passada pela sigmoide) e regressão logística (produto escalar). As
+probabilidades são as mesmas do Pipeline: nas árvores, as features são convertidas para float32
+antes da comparação com os limiares, como o scikit-learn faz.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from sklearn.ensemble import GradientBoostingClassifier
+
+from traducao import rotulo
+
+
+class PreditorRapido:
+    """Probabilidade de busca por tratamento sem passar pelo Pipeline (ver docstring do módulo)."""
+
+    def __init__(self, pipeline, versao=None):
+        # Identifica o modelo nas chaves de cache (ver CachePrevisoes)
+        self.versao = versao
+        self._montar_codificacao(pipeline.named_steps['preprocessor'])
+        self._montar_modelo(pipeline.named_steps['classifier'])
+
+    def _montar_codificacao(self, preprocessor):
+        # Saída do ColumnTransformer: as colunas numéricas, na ordem, seguidas do one-hot das categóricas
+        self.numericas, self.medianas = [], []
+        self.indices = {}
+        posicao = 0
+        for nome, transformador, colunas in preprocessor.transformers_:
+            if nome == 'num':
+                self.numericas = list(colunas)
+                self.medianas = transformador.statistics_.astype(np.float32)
+                posicao += len(colunas)
+            elif nome == 'cat':
+                self.moda = dict(zip(colunas, transformador.named_steps['imputer'].statistics_))
+                codificador = transformador.named_steps['onehot']
+                for coluna, categorias in zip(colunas, codificador.categories_):
+                    indices = {}
+                    for k, categoria in enumerate(categorias):
+                        indices[categoria] = indices[rotulo(categoria, 'pt')] = posicao + k
+                    self.indices[coluna] = indices
+                    posicao += len(categorias)
+        self.n_features = posicao
+
+    def _montar_modelo(self, classificador):
+        self.classe_positiva = int(np.flatnonzero(classificador.classes_ == 1)[0])
+        if isinstance(classificador, GradientBoostingClassifier):
+            self.tipo = 'boosting'
+            arvores = [estimador.tree_ for estimador in classificador.estimators_[:, 0]]
+            self._achatar_arvores(arvores, [arvore.value[:, 0, 0] * classificador.learning_rate for arvore in arvores])
+            # Valor inicial (log-odds a priori): a decisão de um perfil qualquer menos a soma das árvores
+            x = np.zeros((1, self.n_features), dtype=np.float32)
+            self.base = classificador.decision_function(x)[0] - self.valor_folha[self._folhas(x)].sum()
+        elif hasattr(classificador, 'estimators_'):
+            self.tipo = 'floresta'
+            arvores = [estimador.tree_ for estimador in classificador.estimators_]
+            valores = []
+            for arvore in arvores:
+                distribuicao = arvore.value[:, 0, :]
+                soma = distribuicao.sum(axis=1, keepdims=True)
+                valores.append((distribuicao / np.where(soma == 0, 1, soma))[:, self.classe_positiva])
+            self._achatar_arvores(arvores, valores)
+        else:
+            self.tipo = 'linear'
+            self.pesos, self.intercepto = classificador.coef_[0], classificador.intercept_[0]
+
+    def _achatar_arvores(self, arvores, valores):
+        deslocamentos = np.cumsum([0] + [arvore.node_count for arvore in arvores])
+        self.raizes = deslocamentos[:-1]
+
+        # Filhos em índices absolutos do vetor concatenado; folhas apontam para si mesmas
+        esquerda, direita = [], []
+        for inicio, arvore in zip(self.raizes, arvores):
+            folha = arvore.children_left == -1
+            proprio = np.arange(arvore.node_count) + inicio
+            esquerda.append(np.where(folha, proprio, arvore.children_left + inicio))
+            direita.append(np.where(folha, proprio, arvore.children_right + inicio))
+        self.esquerda, self.direita = np.concatenate(esquerda), np.concatenate(direita)
+        self.feature = np.concatenate([np.maximum(arvore.feature, 0) for arvore in arvores])
+        self.limiar = np.concatenate([arvore.threshold for arvore in arvores])
+        self.profundidade = max(arvore.max_depth for arvore in arvores)
+        self.valor_folha = np.ascontiguousarray(np.concatenate(valores))
+
+    def _folhas(self, X):
+        # Nó final de cada linha em cada árvore
+        linhas = np.arange(len(X))[:, None]
+        nos = np.broadcast_to(self.raizes, (len(X), len(self.raizes)))
+        for _ in range(self.profundidade):
+            vai_esquerda = X[linhas, self.feature[nos]] <= self.limiar[nos]
+            nos = np.where(vai_esquerda, self.esquerda[nos], self.direita[nos])
+        return nos
+
+    def _posicoes(self, perfil):
+        # Valores numéricos (já imputados) e a posição one-hot ativa de cada coluna categórica
+        numeros = []
+        for k, coluna in enumerate(self.numericas):
+            valor = perfil.get(coluna)
+            numeros.append(float(self.medianas[k] if valor is None or pd.isna(valor) else valor))
+        ativas = []
+        for coluna, indices in self.indices.items():
+            valor = perfil.get(coluna)
+            if valor is None or pd.isna(valor):
+                valor = self.moda[coluna]
+            # Categoria desconhecida: nenhuma coluna one-hot ativa, como handle_unknown='ignore'
+            ativas.append(indices.get(valor, -1))
+        return tuple(numeros), tuple(ativas)
+
+    def codificar(self, perfil):
+        """Vetor de features (float32) de um perfil dado como dicionário coluna -> valor."""
+        numeros, ativas = self._posicoes(perfil)
+        x = np.zeros(self.n_features, dtype=np.float32)
+        x[:len(numeros)] = numeros
+        x[[k for k in ativas if k >= 0]] = 1
+        return x
+
+    def chave(self, perfil):
+        """
+        Chave compacta do perfil para memoização: versão do modelo e perfil codificado. Perfis que
+        o modelo não distingue (ex.: 'Não sei' e "Don't know") têm a mesma chave.
+        """
+        numeros, ativas = self._posicoes(perfil)
+        return (self.versao, *numeros, *ativas)
+
+    def probabilidades(self, X):
+        """Probabilidade da classe positiva para cada linha de uma matriz de features já codificada."""
+        if self.tipo == 'linear':
+            decisao = np.asarray(X, dtype=np.float64) @ self.pesos + self.intercepto
+            return expit(decisao) if self.classe_positiva == 1 else expit(-decisao)
+        folhas = self._folhas(np.asarray(X, dtype=np.float32))
+        if self.tipo == 'floresta':
+            return self.valor_folha[folhas].mean(axis=1)
+        decisao = self.base + self.valor_folha[folhas].sum(axis=1)
+        return expit(decisao) if self.classe_positiva == 1 else expit(-decisao)
+
+    def probabilidade(self, perfil):
+        """Probabilidade de busca por tratamento de um perfil (rótulos em português ou inglês)."""
+        return float(self.probabilidades(self.codificar(perfil)[None, :])[0])
+
+
+class CachePrevisoes:
+    """
+    Cache LRU de probabilidades, limitado em bytes e seguro para várias sessões ao mesmo tempo.
+
+    O formulário tem um espaço finito de perfis (66 idades x 4 gêneros x 1.350 combinações das
+    demais respostas, cerca de 356 mil), mas só uma pequena parte aparece na prática: o cache é
+    preenchido sob demanda em vez de pré-calcular a tabela inteira. As chaves incluem a versão do
+    modelo (ver PreditorRapido.chave), então previsões de um modelo antigo nunca são reutilizadas e
+    saem do cache à medida que ficam sem uso.
+    """
+
+    # Custo aproximado de cada entrada no OrderedDict, além da chave e do valor
+    CUSTO_ENTRADA = 100
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.acertos = self.falhas = 0
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    @classmethod
+    def _tamanho(cls, chave, valor):
+        return (sys.getsizeof(chave) + sum(sys.getsizeof(parte) for parte in chave)
+                + sys.getsizeof(valor) + cls.CUSTO_ENTRADA)
+
+    def obter(self, chave, calcular):
+        """Valor memoizado de `chave`; em caso de falha, chama `calcular()` e guarda o resultado."""
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave]
+            self.falhas += 1
+
+        # Calculado fora da trava para não bloquear as outras sessões
+        valor = calcular()
+        with self._trava:
+            if chave not in self._entradas:
+                self._entradas[chave] = valor
+                self.bytes += self._tamanho(chave, valor)
+                while self.bytes > self.max_bytes and self._entradas:
+                    antiga, valor_antigo = self._entradas.popitem(last=False)
+                    self.bytes -= self._tamanho(antiga, valor_antigo)
+        return valor
+
+    def estatisticas(self):
+        """Número de entradas, bytes ocupados, acertos, falhas e taxa de acerto."""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {'entradas': len(self._entradas), 'bytes': self.bytes, 'acertos': self.acertos,
+                    'falhas': self.falhas, 'taxa_acerto': self.acertos / consultas if consultas else 0.0}
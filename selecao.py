@@ -0,0 +1,240 @@
+"""
+Seleção de modelo para a página de Classificação.
+
+Validação cruzada estratificada (k-fold, só com a parte de treino da divisão 80/20 de modelo.py)
+sobre uma grade de candidatos: random forest, gradient boosting e regressão logística. Cada ajuste
+(estimador, parâmetros, fold) roda em um pool de processos e tem o resultado gravado em disco, em
+`modelos/selecao/`, de modo que uma nova execução só ajusta as combinações que ainda não foram
+avaliadas. Além das métricas, cada ajuste mede o tempo de treino. Os tempos de previsão (um perfil
+isolado e por perfil em lote) são medidos depois, em série: no pool, os ajustes dos outros folds
+disputam a CPU e inflam a latência. Assim a escolha pode levar em conta desempenho e velocidade. O
+melhor candidato é treinado de novo e publicado no registro do modelo, junto com a tabela
+comparativa:
+
+    python -m selecao --metrica roc_auc --n-jobs 4
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+import ingestao
+import modelo
+import utils
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_SELECAO = modelo.DIRETORIO_MODELOS / 'selecao'
+N_FOLDS = 5
+METRICAS = ['acuracia', 'precisao', 'recall', 'roc_auc']
+TEMPOS = ['tempo_ajuste_s']
+# Medidos em série, fora do pool e fora do cache dos ajustes (ver tempos_predicao)
+TEMPOS_PREDICAO = ['tempo_predicao_ms', 'tempo_por_perfil_us']
+
+# Estimador base e grade de parâmetros de cada candidato
+CANDIDATOS = {
+    'random_forest': (
+        RandomForestClassifier(random_state=42, n_jobs=1),
+        {'n_estimators': [100, 300], 'max_depth': [None, 8], 'min_samples_leaf': [1, 5]},
+    ),
+    'gradient_boosting': (
+        GradientBoostingClassifier(random_state=42),
+        {'n_estimators': [100, 200], 'learning_rate': [0.05, 0.1], 'max_depth': [2, 3]},
+    ),
+    'regressao_logistica': (
+        LogisticRegression(max_iter=2000),
+        {'C': [0.1, 1.0, 10.0]},
+    ),
+}
+
+
+def configuracoes(candidatos=None):
+    """Pares (nome do candidato, parâmetros) de todos os pontos da grade."""
+    for nome in candidatos or CANDIDATOS:
+        grade = CANDIDATOS[nome][1]
+        for valores in itertools.product(*grade.values()):
+            yield nome, dict(zip(grade, valores))
+
+
+def criar_estimador(nome, params):
+    return clone(CANDIDATOS[nome][0]).set_params(**params)
+
+
+def _caminho_resultado(versao_dataset, nome, params, fold, n_folds):
+    chave = json.dumps({
+        'versao_dataset': versao_dataset, 'versao_modelo': modelo.VERSAO_MODELO, 'sklearn': sklearn.__version__,
+        'estimador': nome, 'params': params, 'fold': fold, 'n_folds': n_folds,
+    }, sort_keys=True)
+    return DIRETORIO_SELECAO / f"{hashlib.sha1(chave.encode()).hexdigest()[:16]}.json"
+
+
+def _ler_resultado(caminho):
+    try:
+        return json.loads(caminho.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_resultado(caminho, resultado):
+    try:
+        DIRETORIO_SELECAO.mkdir(parents=True, exist_ok=True)
+        tmp = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(resultado))
+        os.replace(tmp, caminho)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o resultado em %s: %s", DIRETORIO_SELECAO, e)
+
+
+# Dados de treino de cada processo do pool, enviados uma única vez pelo inicializador
+_X = _y = None
+
+
+def _inicializar(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def _avaliar(tarefa):
+    nome, params, treino, validacao = tarefa
+    pipeline = modelo.construir_pipeline(_X, criar_estimador(nome, params))
+    X_validacao, y_validacao = _X.iloc[validacao], _y.iloc[validacao]
+
+    inicio = time.perf_counter()
+    pipeline.fit(_X.iloc[treino], _y.iloc[treino])
+    tempo_ajuste = time.perf_counter() - inicio
+
+    probabilidades = pipeline.predict_proba(X_validacao)[:, 1]
+    previsto = (probabilidades > 0.5).astype(int)
+    return {
+        'acuracia': accuracy_score(y_validacao, previsto),
+        'precisao': precision_score(y_validacao, previsto, zero_division=0),
+        'recall': recall_score(y_validacao, previsto),
+        'roc_auc': roc_auc_score(y_validacao, probabilidades),
+        'tempo_ajuste_s': tempo_ajuste,
+    }
+
+
+def avaliar_grade(X, y, versao_dataset, candidatos=None, n_folds=N_FOLDS, n_jobs=None):
+    """
+    Resultado de cada (candidato, parâmetros, fold) da validação cruzada sobre a parte de treino.
+    Resultados já gravados em disco são reaproveitados; os demais rodam em `n_jobs` processos.
+    """
+    X_treino, _, y_treino, _ = modelo.dividir(X, y)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X_treino, y_treino))
+
+    linhas, pendentes = [], []
+    for (nome, params), (fold, (treino, validacao)) in itertools.product(configuracoes(candidatos), enumerate(folds)):
+        caminho = _caminho_resultado(versao_dataset, nome, params, fold, n_folds)
+        resultado = _ler_resultado(caminho)
+        identificacao = {'estimador': nome, 'params': json.dumps(params, sort_keys=True), 'fold': fold}
+        if resultado is None:
+            pendentes.append((identificacao, caminho, (nome, params, treino, validacao)))
+        else:
+            linhas.append({**identificacao, **resultado})
+
+    logger.info("%d ajustes em cache, %d a executar", len(linhas), len(pendentes))
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_inicializar,
+                                 initargs=(X_treino, y_treino)) as pool:
+            tarefas = [tarefa for _, _, tarefa in pendentes]
+            for (identificacao, caminho, _), resultado in zip(pendentes, pool.map(_avaliar, tarefas)):
+                # Gravado assim que fica pronto: uma execução interrompida não perde o que já foi ajustado
+                _gravar_resultado(caminho, resultado)
+                linhas.append({**identificacao, **resultado})
+
+    return pd.DataFrame(linhas)
+
+
+def resumir(resultados, metrica='roc_auc'):
+    """Média por candidato de cada métrica e tempo (e desvio padrão da métrica escolhida), do melhor ao pior."""
+    agrupado = resultados.groupby(['estimador', 'params'])
+    resumo = agrupado[METRICAS + TEMPOS].mean()
+    resumo[f'{metrica}_desvio'] = agrupado[metrica].std()
+    return resumo.sort_values(metrica, ascending=False).reset_index()
+
+
+def tempos_predicao(pipeline, X_teste, repeticoes=5):
+    """
+    Latência (ms) da previsão de um perfil isolado, como no formulário (mediana de algumas
+    chamadas), e custo por perfil (µs) da previsão em lote de `X_teste`.
+    """
+    perfil = X_teste.iloc[:1]
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        pipeline.predict_proba(perfil)
+        latencias.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    pipeline.predict_proba(X_teste)
+    tempo_lote = time.perf_counter() - inicio
+    return {'tempo_predicao_ms': float(np.median(latencias)) * 1e3,
+            'tempo_por_perfil_us': tempo_lote / len(X_teste) * 1e6}
+
+
+def selecionar(df, metrica='roc_auc', candidatos=None, n_folds=N_FOLDS, n_jobs=None):
+    """Avalia a grade, treina o melhor candidato e o publica no registro. Devolve (pipeline, meta, resumo)."""
+    # Publicado para a versão de referência da política de retreino, a que o app procura no registro
+    df = ingestao.recorte_modelagem(df)
+    X, y = modelo.preparar_dados(df)
+    versao_dataset = utils.versao(df)
+    resumo = resumir(avaliar_grade(X, y, versao_dataset, candidatos, n_folds, n_jobs), metrica)
+
+    melhor = resumo.iloc[0]
+    params = json.loads(melhor['params'])
+    pipeline, info = modelo.treinar(X, y, criar_estimador(melhor['estimador'], params))
+
+    # Tempos de previsão medidos em série, depois da validação cruzada, com cada candidato ajustado
+    # na parte de treino (o melhor já está ajustado); não entram no cache dos ajustes
+    X_treino, X_teste, y_treino, _ = modelo.dividir(X, y)
+    tempos = []
+    for i, candidato in resumo.iterrows():
+        ajustado = pipeline if i == 0 else modelo.construir_pipeline(
+            X, criar_estimador(candidato['estimador'], json.loads(candidato['params']))).fit(X_treino, y_treino)
+        tempos.append(tempos_predicao(ajustado, X_teste))
+    posicao = resumo.columns.get_loc('tempo_ajuste_s') + 1
+    for j, coluna in enumerate(TEMPOS_PREDICAO):
+        resumo.insert(posicao + j, coluna, [t[coluna] for t in tempos])
+
+    info['selecao'] = {
+        'metrica': metrica, 'n_folds': n_folds, 'candidato': melhor['estimador'], 'params': params,
+        'candidatos': resumo.to_dict('records'),
+    }
+    return pipeline, modelo.salvar(pipeline, info, versao_dataset), resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m selecao',
+                                     description="Validação cruzada dos candidatos e publicação do melhor modelo.")
+    parser.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    parser.add_argument('--metrica', choices=METRICAS, default='roc_auc')
+    parser.add_argument('--candidatos', nargs='+', choices=list(CANDIDATOS), default=None)
+    parser.add_argument('--n-folds', type=int, default=N_FOLDS)
+    parser.add_argument('--n-jobs', type=int, default=None, help="processos do pool (padrão: todos os núcleos)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    inicio = time.perf_counter()
+    _, meta, resumo = selecionar(utils.carregar_dataset(args.origem), args.metrica, args.candidatos,
+                                 args.n_folds, args.n_jobs)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_colwidth', 60):
+        print(resumo.round(4).to_string(index=False))
+    print(f"\nMelhor: {meta['selecao']['candidato']} {meta['selecao']['params']} "
+          f"(publicado em {time.perf_counter() - inicio:.1f}s para o dataset {meta['versao_dataset']})")
+
+
+if __name__ == '__main__':
+    main()
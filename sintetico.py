@@ -0,0 +1,204 @@
+"""
+Gerador de respondentes sintéticos para testes de escala.
+
+O survey tem cerca de 1.200 respondentes. Para testar as páginas com milhões, o gerador aprende do
+CSV original a distribuição de cada coluna e uma árvore de Chow-Liu: a árvore geradora de máxima
+informação mútua entre as colunas, em que cada coluna é sorteada condicionada à sua coluna-pai.
+Assim as marginais e as distribuições conjuntas dos pares ligados na árvore são preservadas
+exatamente (a menos do sorteio), e as dos demais pares são aproximadas pelos caminhos da árvore. Os
+valores são os do CSV bruto, inclusive idades absurdas e as grafias livres de gênero tratadas por
+genero.padronizar, de modo que os arquivos gerados passam pela mesma normalização do app.
+
+A amostragem é vetorizada (busca binária na distribuição acumulada de cada valor do pai) e feita em
+blocos, gravados em CSV ou Parquet à medida que ficam prontos. O resultado é determinístico para a
+mesma semente e o mesmo tamanho de bloco:
+
+    python -m sintetico survey-1m.csv --linhas 1000000 --seed 42 --avaliar
+"""
+
+import argparse
+import itertools
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse.csgraph import breadth_first_order, minimum_spanning_tree
+
+import utils
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 100_000
+# Colunas com um valor por respondente (ou quase): sorteadas da marginal, fora da árvore
+INDEPENDENTES = ['Timestamp', 'comments']
+AMOSTRA_AVALIACAO = 100_000
+
+
+def _codificar(serie, categorias=None):
+    # Códigos a partir de 1; 0 é o valor ausente (ou, com `categorias` dadas, um valor desconhecido)
+    if categorias is None:
+        codigos, categorias = pd.factorize(serie)
+        categorias = pd.Index(categorias)
+    else:
+        codigos = categorias.get_indexer(serie)
+    return codigos.astype(np.int32) + 1, categorias
+
+
+def _conjunta(a, b, na, nb):
+    # Contagens da combinação de dois códigos, como matriz na x nb
+    return np.bincount(a.astype(np.int64) * nb + b, minlength=na * nb).reshape(na, nb)
+
+
+def informacao_mutua(conjunta):
+    """Informação mútua (em nats) de uma tabela de contagens."""
+    p = conjunta / conjunta.sum()
+    produto = p.sum(axis=1, keepdims=True) * p.sum(axis=0, keepdims=True)
+    positivos = p > 0
+    return float((p[positivos] * np.log(p[positivos] / produto[positivos])).sum())
+
+
+def _acumulada(contagens):
+    # Distribuição acumulada por linha, terminando exatamente em 1 (linhas vazias ficam uniformes)
+    contagens = np.atleast_2d(contagens).astype(float)
+    vazias = contagens.sum(axis=1) == 0
+    contagens[vazias] = 1
+    acumulada = np.minimum(np.cumsum(contagens, axis=1) / contagens.sum(axis=1, keepdims=True), 1.0)
+    acumulada[:, -1] = 1.0
+    return acumulada
+
+
+class GeradorSintetico:
+    """Modelo de Chow-Liu do survey bruto e amostragem de novos respondentes (ver docstring do módulo)."""
+
+    def __init__(self, df):
+        self.colunas = list(df.columns)
+        self.categorias, codigos = {}, {}
+        for coluna in self.colunas:
+            codigos[coluna], self.categorias[coluna] = _codificar(df[coluna])
+        self.tamanhos = {coluna: len(self.categorias[coluna]) + 1 for coluna in self.colunas}
+        self.arestas = self._arvore(codigos)
+
+        # Ordem de sorteio: raiz e independentes pela marginal, depois cada filho depois do seu pai
+        pais = {filho: pai for pai, filho, _ in self.arestas}
+        self.ordem = [(coluna, pais.get(coluna)) for coluna in self._ordem_topologica(pais)]
+        self.marginais, self.condicionais = {}, {}
+        for coluna, pai in self.ordem:
+            if pai is None:
+                self.marginais[coluna] = _acumulada(np.bincount(codigos[coluna], minlength=self.tamanhos[coluna]))[0]
+            else:
+                acumulada = _acumulada(_conjunta(codigos[pai], codigos[coluna],
+                                                 self.tamanhos[pai], self.tamanhos[coluna]))
+                # Linhas deslocadas pelo código do pai: um único searchsorted sorteia todos os filhos
+                self.condicionais[coluna] = (acumulada + np.arange(len(acumulada))[:, None]).ravel()
+
+    def _arvore(self, codigos):
+        # Árvore geradora de máxima informação mútua (Chow-Liu) entre as colunas não independentes
+        colunas = [c for c in self.colunas if c not in INDEPENDENTES]
+        informacao = np.zeros((len(colunas), len(colunas)))
+        for i, j in itertools.combinations(range(len(colunas)), 2):
+            a, b = colunas[i], colunas[j]
+            informacao[i, j] = informacao_mutua(_conjunta(codigos[a], codigos[b], self.tamanhos[a], self.tamanhos[b]))
+        # Pesos negativos (mínima = máxima informação); o epsilon mantém os pares independentes como arestas
+        arvore = minimum_spanning_tree(-(informacao + 1e-12))
+        ordem, antecessores = breadth_first_order(arvore, 0, directed=False)
+        return [(colunas[antecessores[j]], colunas[j], informacao[min(j, antecessores[j]), max(j, antecessores[j])])
+                for j in ordem[1:]]
+
+    def _ordem_topologica(self, pais):
+        ordem = [c for c in self.colunas if c not in pais]
+        ordem += [filho for _, filho, _ in self.arestas]
+        return ordem
+
+    def _decodificar(self, coluna, codigos):
+        categorias = self.categorias[coluna]
+        serie = pd.Series(pd.Categorical.from_codes(codigos - 1, categories=categorias))
+        if pd.api.types.is_numeric_dtype(categorias):
+            # Colunas numéricas (a idade) voltam ao tipo original, como no CSV
+            return serie.astype(float if (codigos == 0).any() else categorias.dtype)
+        return serie
+
+    def amostrar(self, linhas, rng):
+        """DataFrame com `linhas` respondentes sorteados com o gerador `rng`."""
+        codigos = {}
+        for coluna, pai in self.ordem:
+            u = rng.random(linhas)
+            if pai is None:
+                codigos[coluna] = np.searchsorted(self.marginais[coluna], u, side='right')
+            else:
+                deslocamento = codigos[pai]
+                codigos[coluna] = (np.searchsorted(self.condicionais[coluna], deslocamento + u, side='right')
+                                   - deslocamento * self.tamanhos[coluna])
+        return pd.DataFrame({coluna: self._decodificar(coluna, codigos[coluna]) for coluna in self.colunas})
+
+    def gerar(self, linhas, seed=42, tamanho_bloco=TAMANHO_BLOCO):
+        """DataFrames sucessivos de até `tamanho_bloco` respondentes, somando `linhas`."""
+        rng = np.random.default_rng(seed)
+        for inicio in range(0, linhas, tamanho_bloco):
+            bloco = self.amostrar(min(tamanho_bloco, linhas - inicio), rng)
+            bloco.index += inicio
+            yield bloco
+
+    def gravar(self, caminho, linhas, seed=42, tamanho_bloco=TAMANHO_BLOCO):
+        """Gera `linhas` respondentes direto para um CSV ou Parquet; devolve o caminho."""
+        gravador = utils.GravadorBlocos(caminho)
+        try:
+            for bloco in self.gerar(linhas, seed, tamanho_bloco):
+                gravador.gravar(bloco)
+        finally:
+            gravador.fechar()
+        return caminho
+
+    def distancias(self, original, sintetico):
+        """
+        Distância de variação total entre o original e o sintético: da marginal de cada coluna e da
+        conjunta de cada par de colunas da árvore (indicando os pares ligados por uma aresta).
+        """
+        colunas = [c for c in self.colunas if c not in INDEPENDENTES]
+        codigos = {lado: {c: _codificar(df[c], self.categorias[c])[0] for c in colunas}
+                   for lado, df in (('original', original), ('sintetico', sintetico))}
+
+        def distancia(*cols):
+            tamanhos = [self.tamanhos[c] for c in cols]
+            p, q = ((_conjunta(*(codigos[lado][c] for c in cols), *tamanhos) if len(cols) == 2
+                     else np.bincount(codigos[lado][cols[0]], minlength=tamanhos[0]))
+                    for lado in ('original', 'sintetico'))
+            return 0.5 * np.abs(p / p.sum() - q / q.sum()).sum()
+
+        marginais = pd.Series({c: distancia(c) for c in colunas}, name='tvd')
+        arestas = {frozenset((pai, filho)) for pai, filho, _ in self.arestas}
+        pares = pd.DataFrame([{'a': a, 'b': b, 'tvd': distancia(a, b), 'aresta': frozenset((a, b)) in arestas}
+                              for a, b in itertools.combinations(colunas, 2)])
+        return marginais, pares
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sintetico',
+                                     description="Gera respondentes sintéticos a partir do survey original.")
+    parser.add_argument('saida', help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO)
+    parser.add_argument('--origem', help="URL ou caminho do survey.csv (padrão: SURVEY_SOURCE)")
+    parser.add_argument('--avaliar', action='store_true',
+                        help="compara marginais e pares do original com uma amostra do gerador")
+    args = parser.parse_args(argv)
+
+    original = pd.read_csv(args.origem or utils.origem_dados())
+    gerador = GeradorSintetico(original)
+    inicio = time.perf_counter()
+    gerador.gravar(args.saida, args.linhas, args.seed, args.tamanho_bloco)
+    duracao = time.perf_counter() - inicio
+    print(f"{args.linhas} respondentes em {duracao:.1f}s ({args.linhas / max(duracao, 1e-9) * 60:,.0f} linhas/min)")
+
+    if args.avaliar:
+        amostra = gerador.amostrar(min(args.linhas, AMOSTRA_AVALIACAO), np.random.default_rng(args.seed))
+        marginais, pares = gerador.distancias(original, amostra)
+        print(f"Variação total das marginais: máxima {marginais.max():.4f} ({marginais.idxmax()})")
+        for aresta, grupo in pares.groupby('aresta'):
+            print(f"Pares {'da árvore' if aresta else 'fora da árvore'}: média {grupo['tvd'].mean():.4f}, "
+                  f"máxima {grupo['tvd'].max():.4f}")
+
+
+if __name__ == '__main__':
+    main()
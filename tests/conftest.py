@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils  # noqa: E402
+
+RESPOSTAS = {
+    'Gender': ['Male', 'female', 'M', 'Woman', 'non-binary', 'Trans woman'],
+    'family_history': ['No', 'Yes'],
+    'treatment': ['No', 'Yes'],
+    'work_interfere': ['Never', 'Rarely', 'Sometimes', 'Often', None],
+    'remote_work': ['No', 'Yes'],
+    'tech_company': ['No', 'Yes'],
+    'benefits': ['No', 'Yes', "Don't know"],
+    'care_options': ['No', 'Yes', 'Not sure'],
+    'anonymity': ['No', 'Yes', "Don't know"],
+    'leave': ['Very easy', 'Somewhat easy', "Don't know", 'Somewhat difficult', 'Very difficult'],
+    'Country': ['United States', 'United Kingdom', 'Canada', 'Brazil'],
+}
+
+
+def gerar_respostas(linhas, seed=0):
+    """Respostas brutas sorteadas, no formato do survey.csv, com as colunas usadas pelos modelos."""
+    rng = np.random.default_rng(seed)
+    bruto = pd.DataFrame({coluna: rng.choice(np.array(valores, dtype=object), linhas)
+                          for coluna, valores in RESPOSTAS.items()})
+    bruto.insert(0, 'Age', rng.integers(18, 65, linhas))
+    return bruto
+
+
+@pytest.fixture
+def respostas():
+    """Dataset normalizado como em utils.carregar_dataset, sem versão (fora dos caches)."""
+    df, _ = utils._normalizar(gerar_respostas(600))
+    return df
@@ -0,0 +1,20 @@
+import numpy as np
+
+import perfis
+
+
+def test_codificador_esparso_com_categoria_declarada_sem_respostas(respostas):
+    # O tipo de gender_group declara 'Trans', mas o recorte não tem nenhuma resposta dessa categoria
+    recorte = perfis.preparar_dados(respostas)
+    recorte = recorte[recorte['gender_group'] != 'Trans']
+    assert 'Trans' in recorte['gender_group'].cat.categories
+
+    codificador = perfis.CodificadorEsparso()
+    codificador.observar(recorte)
+    codificador.finalizar()
+    X = codificador.transformar(recorte)
+
+    preprocessador = perfis.construir_preprocessador(recorte)
+    esperado = preprocessador.fit_transform(recorte)
+    assert codificador.nomes == preprocessador.get_feature_names_out().tolist()
+    np.testing.assert_allclose(X.toarray(), esperado.toarray() if hasattr(esperado, 'toarray') else esperado)
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier
+
+import modelo
+import pontuacao
+
+
+def test_pontuar_arquivo_com_gradient_boosting_e_n_jobs(respostas, tmp_path):
+    # GradientBoosting não aceita n_jobs: os blocos são divididos em partes pontuadas em paralelo
+    X, y = modelo.preparar_dados(respostas)
+    pipeline, _ = modelo.treinar(X, y, GradientBoostingClassifier(n_estimators=10, random_state=0))
+    entrada = tmp_path / 'perfis.csv'
+    X.to_csv(entrada, index=False)
+
+    total = pontuacao.pontuar_arquivo(entrada, tmp_path / 'saida.csv', pipeline, tamanho_bloco=100, n_jobs=2)
+
+    resultado = pd.read_csv(tmp_path / 'saida.csv')
+    assert total == len(X)
+    esperado = pontuacao.pontuar(pipeline, pd.read_csv(entrada))
+    np.testing.assert_allclose(resultado[pontuacao.COLUNA_PROBABILIDADE], esperado)
@@ -0,0 +1,60 @@
+"""
+Camada de tradução (PT/EN) das respostas da pesquisa.
+
+Um único dicionário (ROTULOS_PT) guarda o rótulo em português de cada resposta em inglês; o mapa
+inverso usado no formulário de Classificação é derivado dele. Como as colunas são categóricas,
+traduzir é apenas renomear as categorias: o custo depende do número de categorias, não de linhas,
+e os códigos inteiros são compartilhados com o DataFrame original.
+"""
+
+import pandas as pd
+
+ROTULOS_PT = {
+    'Yes': 'Sim',
+    'No': 'Não',
+    'Maybe': 'Talvez',
+    "Don't know": 'Não sei',
+    'Not sure': 'Não tenho certeza',
+    'Some of them': 'Algum deles',
+    'Very easy': 'Muito fácil',
+    'Somewhat easy': 'Um pouco fácil',
+    'Somewhat difficult': 'Um pouco difícil',
+    'Very difficult': 'Muito difícil',
+    'Never': 'Nunca',
+    'Rarely': 'Raramente',
+    'Sometimes': 'Às vezes',
+    'Often': 'Frequentemente',
+}
+ROTULOS_EN = {pt: en for en, pt in ROTULOS_PT.items()}
+
+
+def rotulo(valor, idioma='pt'):
+    """Rótulo de uma resposta no idioma pedido; valores sem tradução são devolvidos como estão."""
+    if idioma == 'pt':
+        return ROTULOS_PT.get(valor, valor)
+    return ROTULOS_EN.get(valor, valor)
+
+
+def para_ingles(serie):
+    """Converte uma coluna de rótulos em português para os valores originais (em inglês) do dataset."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    return traduzir_serie(serie, 'en')
+
+
+def traduzir_serie(serie, idioma='pt'):
+    """Traduz uma coluna categórica renomeando as categorias (os códigos não são copiados)."""
+    categorias = [rotulo(c, idioma) for c in serie.cat.categories]
+    if list(serie.cat.categories) == categorias:
+        return serie
+    traduzida = pd.Categorical.from_codes(serie.cat.codes.to_numpy(), categories=categorias,
+                                          ordered=serie.cat.ordered, validate=False)
+    return pd.Series(traduzida, index=serie.index, name=serie.name)
+
+
+def traduzir(df, idioma='pt'):
+    """Devolve um DataFrame com todas as colunas categóricas traduzidas para o idioma pedido."""
+    traduzido = df.copy(deep=False)
+    for coluna in df.select_dtypes('category').columns:
+        traduzido[coluna] = traduzir_serie(df[coluna], idioma)
+    return traduzido
@@ -1,60 +1,585 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import streamlit as st
 
+import esquema
+import genero as genero_mod
+import instrumentacao
+
+logger = logging.getLogger(__name__)
+
+URL_PADRAO = 'https://raw.githubusercontent.com/JeanMagnus/ciencia-dados/main/survey.csv'
+DIRETORIO_CACHE = Path(os.environ.get('SURVEY_CACHE_DIR', Path(__file__).resolve().parent / '.cache'))
+# Incrementar sempre que _normalizar mudar, para invalidar snapshots antigos
+VERSAO_SNAPSHOT = 4
+# Visão do dataset entregue a cada thread de script (ver load_data e memoria_execucao)
+_execucao = threading.local()
+
+
 def simplificar_genero(genero):
-    genero = str(genero).strip().lower()
+    # Mantida para compatibilidade; a classificação vetorizada fica em genero.classificar
+    return genero_mod.classificar_termo(genero, 'gender_group')
 
-    if "trans" in genero:
-        return "Trans"
 
-    elif genero in ['m','male', 'cis male', 'cis man', 'man', 'male (cis)',
-                    'male-ish', 'maile', 'mal', 'msle', 'malr', 'mail', 'make',
-                    'guy (-ish) ^_^', 'ostensibly male, unsure what that really means',
-                    'something kinda male?', 'male leaning androgynous']:
-        return "Homem"
+def origem_dados():
+    """Origem do survey.csv: variável de ambiente SURVEY_SOURCE (URL ou caminho local) ou a URL padrão."""
+    return os.environ.get('SURVEY_SOURCE', URL_PADRAO)
 
-    elif genero in ['f','female', 'cis female', 'cis-female/femme', 'femail',
-                    'femake', 'female (cis)']:
-        return "Mulher"
 
-    elif genero in ['non-binary', 'enby', 'fluid', 'androgyne', 'neuter',
-                    'queer', 'nah', 'all', 'p', 'a little about you',
-                    'queer/she/they']:
-        return "Não-binário"
+def eh_url(origem):
+    """Se a origem é uma URL (http ou https), e não um arquivo local."""
+    return str(origem).startswith(('http://', 'https://'))
 
-    else:
-        return "Não-binário"
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv('https://raw.githubusercontent.com/JeanMagnus/ciencia-dados/main/survey.csv')
+def _impressao_digital(origem):
+    """Hash do conteúdo (arquivo local) ou ETag (URL). Retorna None quando não é possível verificar."""
+    if not eh_url(origem):
+        h = hashlib.sha256()
+        with open(origem, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        return f"sha256:{h.hexdigest()}"
+
+    try:
+        req = urllib.request.Request(origem, method='HEAD')
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            etag = resp.headers.get('ETag')
+    except OSError:
+        # Sem rede (ex.: pods isolados): o snapshot local é usado sem verificação
+        return None
+    return f"etag:{etag}" if etag else None
+
+
+def caminhos_snapshot(origem):
+    """Caminhos do snapshot Arrow da origem e dos seus metadados (JSON) em DIRETORIO_CACHE."""
+    chave = hashlib.sha1(str(origem).encode()).hexdigest()[:12]
+    return DIRETORIO_CACHE / f"survey-{chave}.arrow", DIRETORIO_CACHE / f"survey-{chave}.json"
+
+
+def _arquivos(caminho, meta):
+    # Snapshot base seguido dos segmentos anexados, na ordem
+    return [caminho] + [caminho.with_name(s['arquivo']) for s in meta.get('segmentos', [])]
+
+
+def _encadear(versao_anterior, conteudo):
+    # Versão do dataset depois de anexar um segmento: depende da anterior e do conteúdo do segmento
+    return hashlib.sha1(f"{versao_anterior}|{conteudo}".encode()).hexdigest()[:16]
+
+
+def _versoes(meta):
+    """Versão do dataset e número de linhas depois da base e de cada segmento anexado."""
+    versoes, linhas = [meta['versao']], [meta['linhas']]
+    for segmento in meta.get('segmentos', []):
+        versoes.append(segmento['versao'])
+        linhas.append(linhas[-1] + segmento['linhas'])
+    return versoes, linhas
+
+
+def _marcar_versao(df, meta):
+    versoes, linhas = _versoes(meta)
+    df.attrs['versao'] = versoes[-1]
+    # Histórico usado pelos agregados incrementais (cache_incremental) e pela política de retreino
+    df.attrs['versoes'], df.attrs['linhas_versoes'] = versoes, linhas
+
+
+def _ler_meta(caminho_meta):
+    try:
+        return json.loads(caminho_meta.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _substituir(caminho, escrever):
+    # Escrita atômica: várias réplicas podem gerar o snapshot ao mesmo tempo
+    DIRETORIO_CACHE.mkdir(parents=True, exist_ok=True)
+    tmp = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+    escrever(tmp)
+    os.replace(tmp, caminho)
+
+
+def _gravar_meta(caminho_meta, meta):
+    _substituir(caminho_meta, lambda tmp: tmp.write_text(json.dumps(meta, indent=2)))
+
+
+def _gravar_snapshot(df, caminho, caminho_meta, meta):
+    try:
+        _substituir(caminho, lambda tmp: feather.write_feather(df, tmp, compression='uncompressed'))
+        _gravar_meta(caminho_meta, meta)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o snapshot em %s: %s", DIRETORIO_CACHE, e)
 
+
+def _normalizar(df):
+    """Normaliza o CSV bruto e devolve o DataFrame tipado junto com o relatório de memória por coluna."""
     # Normalização de colunas
     df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    memoria_antes = df.memory_usage(deep=True)
+
+    with instrumentacao.medir('classificar_genero', linhas=len(df)):
+        # Padronização básica de gênero
+        df['gender'] = genero_mod.padronizar(df['gender'])
+
+        # Agrupamentos classificados apenas sobre os valores distintos
+        df['gender_group'] = genero_mod.classificar(df['gender'], 'gender_group')
+
+        # Grupo unindo Trans e Não-binário
+        df['grupo'] = genero_mod.classificar(df['gender'], 'grupo')
+
+    # Tipos declarados: categóricas com categorias conhecidas e idade inteira compacta
+    esquema.aplicar_esquema(df)
+
+    return df, esquema.relatorio_memoria(memoria_antes, df.memory_usage(deep=True))
+
 
-    # Padronização básica de gênero
-    df['gender'] = df['gender'].str.lower().str.strip()
-    df['gender'] = df['gender'].replace({
-        'male': 'male', 'm': 'male', 'man': 'male',
-        'female': 'female', 'f': 'female', 'woman': 'female',
-        'non-binary': 'non-binary', 'nb': 'non-binary',
-        'trans-female': 'trans', 'trans woman': 'trans',
-        'trans male': 'trans', 'trans man': 'trans',
-        'agender': 'non-binary', 'genderqueer': 'non-binary'
-    })
-    df['gender'] = df['gender'].fillna('not specified')
-
-    # Agrupamento final com função robusta
-    df['gender_group'] = df['gender'].apply(simplificar_genero)
-
-    # Grupo unindo Trans e Não-binário
-    df['grupo'] = df['gender_group'].replace({
-        'Trans': 'Trans/NB',
-        'Não-binário': 'Trans/NB'
-    })
+def carregar_dataset(origem=None):
+    """
+    Carrega o dataset normalizado usando o snapshot colunar em disco (Arrow/Feather, mapeado em memória).
+    O CSV só é lido novamente quando o hash/ETag da origem muda ou a normalização muda de versão.
+    Os segmentos anexados ao snapshot (ver anexar_segmento) são lidos junto com a base.
+    """
+    origem = origem or origem_dados()
+    caminho, caminho_meta = caminhos_snapshot(origem)
+    impressao = _impressao_digital(origem)
+    meta = _ler_meta(caminho_meta)
 
+    if (meta and all(arquivo.exists() for arquivo in _arquivos(caminho, meta))
+            and meta.get('versao_snapshot') == VERSAO_SNAPSHOT
+            and impressao in (None, meta.get('impressao'))):
+        with instrumentacao.medir('ler_snapshot', linhas=_versoes(meta)[1][-1]):
+            df = _ler_snapshot(caminho, meta)
+        _marcar_versao(df, meta)
+        return df
+
+    with instrumentacao.medir('ler_csv') as medida:
+        df, memoria = _normalizar(pd.read_csv(origem))
+        medida.linhas = len(df)
+    # Versão do dataset: chave dos caches derivados (traduções, agregações, modelos)
+    versao_base = hashlib.sha1(f"{impressao or time.time_ns()}|{VERSAO_SNAPSHOT}".encode()).hexdigest()[:16]
+    novo = {
+        'origem': str(origem),
+        'impressao': impressao,
+        'versao': versao_base,
+        'versao_snapshot': VERSAO_SNAPSHOT,
+        'linhas': len(df),
+        'memoria': {
+            'antes': memoria['antes'].dropna().astype(int).to_dict(),
+            'depois': memoria['depois'].dropna().astype(int).to_dict(),
+        },
+        'segmentos': _segmentos_mantidos(caminho, meta, versao_base),
+    }
+    _gravar_snapshot(df, caminho, caminho_meta, novo)
+    if novo['segmentos']:
+        # Respostas anexadas antes de a origem mudar continuam valendo sobre a base nova
+        if _ler_meta(caminho_meta) == novo:
+            df = _ler_snapshot(caminho, novo)
+        else:
+            novo['segmentos'] = []
+    _marcar_versao(df, novo)
+    return df
+
+
+def _ler_snapshot(caminho, meta):
+    # Base e segmentos mapeados em memória e convertidos de uma vez (os dicionários das categóricas são unificados)
+    tabelas = [feather.read_table(arquivo, memory_map=True) for arquivo in _arquivos(caminho, meta)]
+    df = (tabelas[0] if len(tabelas) == 1 else pa.concat_tables(tabelas)).to_pandas()
+    if len(tabelas) > 1:
+        # Categorias inferidas (país, estado) que só apareceram nos segmentos voltam à ordem alfabética
+        for coluna, tipo in esquema.ESQUEMA.items():
+            if isinstance(tipo, str) and coluna in df and not df[coluna].cat.categories.is_monotonic_increasing:
+                df[coluna] = df[coluna].cat.reorder_categories(df[coluna].cat.categories.sort_values())
     return df
-    
+
+
+def _segmentos_mantidos(caminho, meta, versao_base):
+    """
+    Segmentos anexados ao snapshot anterior, reencadeados sobre a nova versão da base. Segmentos
+    gravados com outra versão da normalização não podem ser reaproveitados e são apagados.
+    """
+    segmentos = (meta or {}).get('segmentos', [])
+    if not segmentos:
+        return []
+    if meta.get('versao_snapshot') != VERSAO_SNAPSHOT:
+        logger.warning("%d segmentos anexados foram descartados: a normalização mudou de versão", len(segmentos))
+        for arquivo in _arquivos(caminho, meta)[1:]:
+            arquivo.unlink(missing_ok=True)
+        return []
+    mantidos, versao_anterior = [], versao_base
+    for segmento in segmentos:
+        if not caminho.with_name(segmento['arquivo']).exists():
+            logger.warning("Segmento %s não encontrado; as respostas dele ficam de fora", segmento['arquivo'])
+            continue
+        versao_anterior = _encadear(versao_anterior, segmento['conteudo'])
+        mantidos.append({**segmento, 'versao': versao_anterior})
+    return mantidos
+
+
+def anexar_segmento(lote, origem=None):
+    """
+    Normaliza um lote de respostas novas (com as colunas do CSV) e o grava como um segmento do
+    snapshot, sem reler o CSV nem regravar o que já está em disco. Devolve os metadados do segmento.
+    Um único processo deve anexar segmentos a uma origem por vez.
+    """
+    origem = origem or origem_dados()
+    caminho, caminho_meta = caminhos_snapshot(origem)
+    meta = _ler_meta(caminho_meta)
+    if not (meta and caminho.exists() and meta.get('versao_snapshot') == VERSAO_SNAPSHOT):
+        carregar_dataset(origem)
+        meta = _ler_meta(caminho_meta)
+        if meta is None:
+            raise OSError(f"O snapshot de {origem} não pôde ser gravado em {DIRETORIO_CACHE}")
+
+    esquema_base = feather.read_table(caminho, memory_map=True).schema
+    with instrumentacao.medir('normalizar_lote', linhas=len(lote)):
+        df, _ = _normalizar(lote.copy())
+    faltando = [coluna for coluna in esquema_base.names if coluna not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no lote: {', '.join(faltando)}")
+    extras = sorted(set(df.columns) - set(esquema_base.names))
+    if extras:
+        logger.warning("Colunas ignoradas no lote: %s", ', '.join(extras))
+    tabela = pa.Table.from_pandas(df[esquema_base.names], preserve_index=False).cast(esquema_base)
+
+    segmentos = meta.get('segmentos', [])
+    conteudo = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+    nova_versao = _encadear(_versoes(meta)[0][-1], conteudo)
+    segmento = {
+        'arquivo': f"{caminho.stem}-{nova_versao}.arrow",
+        'linhas': len(df),
+        'conteudo': conteudo,
+        'versao': nova_versao,
+        'anexado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    # O segmento vai para o disco antes dos metadados: quem lê o snapshot nunca vê um segmento pela metade
+    _substituir(caminho.with_name(segmento['arquivo']),
+                lambda tmp: feather.write_feather(tabela, tmp, compression='uncompressed'))
+    _gravar_meta(caminho_meta, {**meta, 'segmentos': segmentos + [segmento]})
+    return segmento
+
+
+def descartar_segmentos(origem=None):
+    """Remove os segmentos anexados ao snapshot da origem (o dataset volta a ser só o CSV); devolve quantos eram."""
+    caminho, caminho_meta = caminhos_snapshot(origem or origem_dados())
+    meta = _ler_meta(caminho_meta)
+    if not meta or not meta.get('segmentos'):
+        return 0
+    _gravar_meta(caminho_meta, {**meta, 'segmentos': []})
+    for arquivo in _arquivos(caminho, meta)[1:]:
+        arquivo.unlink(missing_ok=True)
+    return len(meta['segmentos'])
+
+
+def arquivos_snapshot(df, origem=None):
+    """
+    Arquivos Arrow (base e segmentos) com exatamente as linhas de `df`, para leitura em blocos.
+    None quando o snapshot em disco não corresponde à versão de `df` ou falta algum arquivo.
+    """
+    caminho, caminho_meta = caminhos_snapshot(origem or origem_dados())
+    meta = _ler_meta(caminho_meta)
+    versoes = df.attrs.get('versoes')
+    if not meta or not versoes or _versoes(meta)[0][:len(versoes)] != versoes:
+        return None
+    arquivos = _arquivos(caminho, meta)[:len(versoes)]
+    return arquivos if all(arquivo.exists() for arquivo in arquivos) else None
+
+
+def memoria_esquema(origem=None):
+    """
+    Relatório de esquema.relatorio_memoria (memória por coluna antes e depois do esquema de tipos)
+    gravado nos metadados do snapshot quando o CSV foi lido. Vazio se não há snapshot.
+    """
+    _, caminho_meta = caminhos_snapshot(origem or origem_dados())
+    memoria = (_ler_meta(caminho_meta) or {}).get('memoria', {})
+    return esquema.relatorio_memoria(pd.Series(memoria.get('antes', {}), dtype='float64'),
+                                     pd.Series(memoria.get('depois', {}), dtype='float64'))
+
+
+def eh_parquet(caminho):
+    return Path(caminho).suffix.lower() in ('.parquet', '.pq')
+
+
+class GravadorBlocos:
+    """Grava DataFrames em CSV ou Parquet (conforme a extensão) à medida que os blocos chegam."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.parquet = eh_parquet(caminho)
+        self.escritor = None
+
+    def gravar(self, bloco):
+        if self.parquet:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if self.escritor is None:
+                self.escritor = pq.ParquetWriter(self.caminho, tabela.schema)
+            self.escritor.write_table(tabela.cast(self.escritor.schema))
+        else:
+            bloco.to_csv(self.caminho, mode='w' if self.escritor is None else 'a',
+                         header=self.escritor is None, index=False)
+            self.escritor = True
+
+    def fechar(self):
+        if self.parquet and self.escritor is not None:
+            self.escritor.close()
+
+
+# Copy-on-write (padrão a partir do pandas 3): visões do dataset compartilhado nunca o alteram
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+
+class CarregamentoEmSegundoPlano:
+    """
+    Carrega o dataset e prepara o modelo de classificação em uma thread, para que a página inicial
+    e a navegação sejam exibidas sem esperar a leitura dos dados nem a importação do scikit-learn.
+    `dataset` é um Future com o DataFrame; `etapa` indica o andamento (ver ETAPAS).
+    """
+
+    ETAPAS = ["Carregando os dados", "Preparando o modelo de classificação", "Pronto"]
+
+    def __init__(self):
+        self.dataset = Future()
+        self.etapa = 0
+        threading.Thread(target=self._executar, name='carregamento', daemon=True).start()
+
+    def _executar(self):
+        try:
+            self.dataset.set_result(carregar_dataset())
+        except Exception as e:
+            self.dataset.set_exception(e)
+            return
+        self.etapa = 1
+        try:
+            # Importado só aqui: o scikit-learn fica fora do caminho da página inicial
+            import modelo
+            modelo.obter_modelo(self.dataset.result())
+        except Exception:
+            # A página de Classificação tenta de novo e mostra o erro, se houver
+            logger.exception("Falha ao preparar o modelo em segundo plano")
+        self.etapa = 2
+
+    @property
+    def concluido(self):
+        return self.etapa == len(self.ETAPAS) - 1
+
+    @property
+    def erro(self):
+        """Exceção da leitura dos dados, quando ela falhou (None enquanto carrega ou se deu certo)."""
+        return self.dataset.exception() if self.dataset.done() else None
+
+    def progresso(self):
+        """Fração concluída e descrição da etapa atual, para uma barra de progresso."""
+        return self.etapa / (len(self.ETAPAS) - 1), self.ETAPAS[self.etapa]
+
+
+@st.cache_resource
+def carregamento():
+    """
+    Carregamento em segundo plano do processo, iniciado pela primeira sessão que o pede. Um
+    carregamento que falhou deve ser descartado com `carregamento.clear()`, para que o próximo
+    rerun tente de novo.
+    """
+    return CarregamentoEmSegundoPlano()
+
+
+class DatasetCompartilhado:
+    """
+    Dataset do processo, compartilhado por todas as sessões (nunca alterado). Quando um lote novo é
+    anexado ao snapshot (ver ingestao.py), `atual()` passa a devolver o snapshot relido; a
+    verificação é só a data de modificação dos metadados do snapshot.
+    """
+
+    def __init__(self, df, origem=None):
+        self.df = df
+        self.origem = origem or origem_dados()
+        self._caminho_meta = caminhos_snapshot(self.origem)[1]
+        self._modificado = self._data_meta()
+        self._trava = threading.Lock()
+
+    def _data_meta(self):
+        try:
+            return self._caminho_meta.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def atual(self):
+        modificado = self._data_meta()
+        if modificado != self._modificado:
+            with self._trava:
+                if modificado != self._modificado:
+                    meta = _ler_meta(self._caminho_meta)
+                    if meta and _versoes(meta)[0][-1] != versao(self.df):
+                        self.df = carregar_dataset(self.origem)
+                    self._modificado = modificado
+        return self.df
+
+
+@st.cache_resource
+def _dataset_compartilhado():
+    # Uma única instância por processo, compartilhada por todas as sessões
+    instrumentacao.falha_cache()
+    try:
+        df = carregamento().dataset.result()
+    except Exception:
+        # Erros de rede ou do CSV não ficam em cache: o próximo rerun carrega de novo
+        carregamento.clear()
+        raise
+    return DatasetCompartilhado(df)
+
+
+def load_data():
+    """
+    Dataset da sessão: uma visão rasa do dataset compartilhado pelo processo. As colunas não são
+    copiadas; com copy-on-write, alterações feitas pela página ficam só na sua visão.
+    """
+    with instrumentacao.medir('load_data', cache=True) as medida:
+        df = _dataset_compartilhado().atual().copy(deep=False)
+        medida.linhas = len(df)
+    # Última visão entregue nesta execução, para memoria_execucao
+    _execucao.visao = df
+    return df
+
+
+def _enderecos(serie):
+    # Endereços dos buffers de dados da coluna, para saber se duas colunas dividem a mesma memória
+    valores = serie.array
+    if isinstance(valores, pd.Categorical):
+        valores = valores.codes
+    if isinstance(valores, np.ndarray):
+        return {valores.__array_interface__['data'][0]}
+    if hasattr(valores, '__arrow_array__'):
+        # Inteiros com NA e strings: buffers de dados da representação Arrow (sem o bitmap de validade)
+        arrow = valores.__arrow_array__()
+        pedacos = arrow.chunks if hasattr(arrow, 'chunks') else [arrow]
+        return {b.address for p in pedacos for b in p.buffers()[1:] if b is not None and b.size}
+    return {np.asarray(valores).__array_interface__['data'][0]}
+
+
+def memoria_sessao(df):
+    """Bytes das colunas do DataFrame de uma sessão: total, próprios da sessão e compartilhados com o processo."""
+    compartilhado = _dataset_compartilhado().df
+    total = propria = 0
+    for coluna in df.columns:
+        uso = int(df[coluna].memory_usage(deep=True, index=False))
+        total += uso
+        if coluna not in compartilhado.columns or not _enderecos(df[coluna]) & _enderecos(compartilhado[coluna]):
+            propria += uso
+    return {'total': total, 'propria': propria, 'compartilhada': total - propria}
+
+
+def memoria_execucao():
+    """
+    memoria_sessao da última visão entregue por load_data na execução atual, medida depois que a
+    página rodou (as colunas que ela alterou já são próprias). Chamada ao final de cada execução em
+    Home.py, libera a visão; devolve None se a página não carregou o dataset ou se nem o painel nem o
+    log de instrumentação estão ligados.
+    """
+    visao, _execucao.visao = getattr(_execucao, 'visao', None), None
+    if visao is None or not instrumentacao.detalhada():
+        return None
+    return memoria_sessao(visao)
+
+
+def versao(df):
+    """Versão do dataset de onde o DataFrame veio (muda sempre que o snapshot é regerado)."""
+    return df.attrs.get('versao')
+
+
+def cache_por_versao(recurso=False, **opcoes):
+    """
+    st.cache_data para funções cujo primeiro argumento é o dataset. A chave do cache é a versão do
+    dataset (e os demais argumentos), evitando serializar o DataFrame inteiro a cada chamada.
+    Com `recurso=True` usa st.cache_resource: o resultado é compartilhado sem cópia e não pode ser
+    alterado por quem o recebe. DataFrames sem versão conhecida são processados sem cache.
+    """
+    def decorador(func):
+        def _cacheada(_df, versao_dataset, *args, **kwargs):
+            # Só roda nas falhas do cache
+            instrumentacao.falha_cache()
+            return func(_df, *args, **kwargs)
+        # Nome próprio por função: o Streamlit identifica o cache pelo módulo e nome qualificado
+        _cacheada.__module__ = func.__module__
+        _cacheada.__qualname__ = f"{func.__qualname__}.<cache>"
+        cacheada = (st.cache_resource if recurso else st.cache_data)(**opcoes)(_cacheada)
+        nome = instrumentacao.nome_funcao(func)
+
+        @functools.wraps(func)
+        def wrapper(df, *args, **kwargs):
+            with instrumentacao.medir(nome, linhas=len(df), cache=versao(df) is not None):
+                if versao(df) is None:
+                    return func(df, *args, **kwargs)
+                return cacheada(df, versao(df), *args, **kwargs)
+
+        wrapper.clear = cacheada.clear
+        return wrapper
+    return decorador
+
+
+def cache_incremental(combinar, max_entries=64):
+    """
+    Memoização por versão para agregados aditivos nas linhas, em que o resultado do dataset com um
+    segmento novo é `combinar(resultado_anterior, resultado_das_linhas_novas)`. Quando o dataset
+    ganha segmentos (ver anexar_segmento), só as linhas anexadas desde a última versão em memória
+    são processadas. `combinar` devolve None quando os resultados não são compatíveis (ex.: uma
+    categoria nova), e então tudo é recalculado. O resultado é compartilhado entre as sessões e não
+    pode ser alterado por quem o recebe; DataFrames sem versão são processados sem cache.
+    """
+    def decorador(func):
+        resultados = OrderedDict()
+        trava = threading.Lock()
+        nome = instrumentacao.nome_funcao(func)
+
+        @functools.wraps(func)
+        def wrapper(df, *args, **kwargs):
+            versoes, linhas = df.attrs.get('versoes'), df.attrs.get('linhas_versoes')
+            # Recortes do dataset (ex.: linhas filtradas) herdam os attrs, mas não são uma versão dele
+            if not versoes or len(df) != linhas[-1]:
+                return func(df, *args, **kwargs)
+            argumentos = repr((args, sorted(kwargs.items())))
+
+            with instrumentacao.medir(nome, linhas=len(df), cache=True) as medida:
+                with trava:
+                    resultado = resultados.get((versoes[-1], argumentos))
+                    if resultado is not None:
+                        resultados.move_to_end((versoes[-1], argumentos))
+                        return resultado
+                    anterior = next(((i, resultados[(versoes[i], argumentos)]) for i in range(len(versoes) - 2, -1, -1)
+                                     if (versoes[i], argumentos) in resultados), None)
+                instrumentacao.falha_cache()
+
+                if anterior is not None:
+                    novas = df.iloc[linhas[anterior[0]]:]
+                    novas.attrs = {}
+                    medida.linhas = len(novas)
+                    resultado = combinar(anterior[1], func(novas, *args, **kwargs))
+                if resultado is None:
+                    medida.linhas = len(df)
+                    resultado = func(df, *args, **kwargs)
+
+                with trava:
+                    resultados[(versoes[-1], argumentos)] = resultado
+                    while len(resultados) > max_entries:
+                        resultados.popitem(last=False)
+                return resultado
+
+        wrapper.clear = resultados.clear
+        return wrapper
+    return decorador
+
+
 
 # FUNÇÃO CENTRALIZADA PARA TODOS OS ESTILOS VISUAIS (VERSÃO ATUALIZADA)
 def aplicar_estilos():